@@ -0,0 +1,52 @@
+"""Add user_game_stats rollup
+
+Revision ID: 0040f41fb236
+Revises: 129b3e5be5f7
+Create Date: 2026-10-18 10:03:47.218953
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0040f41fb236'
+down_revision: Union[str, None] = '129b3e5be5f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_game_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('game_type_id', sa.Integer(), nullable=False),
+    sa.Column('total_games', sa.Integer(), nullable=False),
+    sa.Column('wins', sa.Integer(), nullable=False),
+    sa.Column('losses', sa.Integer(), nullable=False),
+    sa.Column('draws', sa.Integer(), nullable=False),
+    sa.Column('total_score', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['game_type_id'], ['game_types.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'game_type_id')
+    )
+
+    # Backfill from the existing history
+    op.execute(
+        "INSERT INTO user_game_stats (user_id, game_type_id, total_games, wins, losses, draws, total_score) "
+        "SELECT s.user_id, r.game_type_id, COUNT(s.id), "
+        "SUM(CASE WHEN s.result = 'win' THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN s.result = 'loss' THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN s.result = 'draw' THEN 1 ELSE 0 END), "
+        "SUM(COALESCE(s.score, 0)) "
+        "FROM game_sessions s JOIN game_rooms r ON s.room_id = r.id "
+        "WHERE s.user_id IS NOT NULL AND r.game_type_id IS NOT NULL "
+        "GROUP BY s.user_id, r.game_type_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_game_stats')
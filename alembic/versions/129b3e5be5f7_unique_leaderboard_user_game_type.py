@@ -0,0 +1,62 @@
+"""Unique leaderboard (user_id, game_type_id)
+
+Revision ID: 129b3e5be5f7
+Revises: b8c38ea9e3d1
+Create Date: 2026-10-18 09:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '129b3e5be5f7'
+down_revision: Union[str, None] = 'b8c38ea9e3d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # end_rps_session used to insert rows without game_type_id: they are all rps
+    op.execute(
+        "UPDATE leaderboard SET game_type_id = (SELECT id FROM game_types WHERE name = 'rps') "
+        "WHERE game_type_id IS NULL"
+    )
+    op.execute(
+        "UPDATE leaderboard SET wins = COALESCE(wins, 0), losses = COALESCE(losses, 0), "
+        "draws = COALESCE(draws, 0)"
+    )
+
+    # Fold duplicate rows into the oldest one before adding the unique key
+    op.execute(
+        "UPDATE leaderboard SET "
+        "wins = (SELECT SUM(l2.wins) FROM leaderboard l2 WHERE l2.user_id = leaderboard.user_id "
+        "AND l2.game_type_id IS leaderboard.game_type_id), "
+        "losses = (SELECT SUM(l2.losses) FROM leaderboard l2 WHERE l2.user_id = leaderboard.user_id "
+        "AND l2.game_type_id IS leaderboard.game_type_id), "
+        "draws = (SELECT SUM(l2.draws) FROM leaderboard l2 WHERE l2.user_id = leaderboard.user_id "
+        "AND l2.game_type_id IS leaderboard.game_type_id) "
+        "WHERE id IN (SELECT MIN(id) FROM leaderboard GROUP BY user_id, game_type_id HAVING COUNT(*) > 1)"
+        if op.get_bind().dialect.name == "sqlite" else
+        "UPDATE leaderboard SET "
+        "wins = agg.wins, losses = agg.losses, draws = agg.draws "
+        "FROM (SELECT MIN(id) AS id, SUM(wins) AS wins, SUM(losses) AS losses, SUM(draws) AS draws "
+        "FROM leaderboard GROUP BY user_id, game_type_id HAVING COUNT(*) > 1) AS agg "
+        "WHERE leaderboard.id = agg.id"
+    )
+    op.execute(
+        "DELETE FROM leaderboard WHERE id NOT IN "
+        "(SELECT MIN(id) FROM leaderboard GROUP BY user_id, game_type_id)"
+    )
+
+    with op.batch_alter_table('leaderboard') as batch_op:
+        batch_op.create_unique_constraint('uq_leaderboard_user_game_type', ['user_id', 'game_type_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('leaderboard') as batch_op:
+        batch_op.drop_constraint('uq_leaderboard_user_game_type', type_='unique')
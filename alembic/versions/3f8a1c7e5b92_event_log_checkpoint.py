@@ -0,0 +1,32 @@
+"""Event log checkpoint
+
+Revision ID: 3f8a1c7e5b92
+Revises: 9d41c6e2f7b3
+Create Date: 2026-10-18 18:41:09.271845
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f8a1c7e5b92'
+down_revision: Union[str, None] = '9d41c6e2f7b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('event_log_checkpoint',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('applied_seq', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('event_log_checkpoint')
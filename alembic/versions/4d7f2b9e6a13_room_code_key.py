@@ -0,0 +1,35 @@
+"""room_code_sequence.code_key
+
+Revision ID: 4d7f2b9e6a13
+Revises: 8e5b7d3a1c46
+Create Date: 2026-10-18 23:41:19.502736
+
+"""
+import secrets
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d7f2b9e6a13'
+down_revision: Union[str, None] = '8e5b7d3a1c46'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('room_code_sequence', sa.Column('code_key', sa.String(), nullable=True))
+    # Random permutation key for this database; codes handed out from now on follow it
+    op.get_bind().execute(
+        sa.text("UPDATE room_code_sequence SET code_key = :key WHERE code_key IS NULL"),
+        {"key": secrets.token_hex(16)},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('room_code_sequence') as batch_op:
+        batch_op.drop_column('code_key')
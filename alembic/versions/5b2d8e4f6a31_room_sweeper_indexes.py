@@ -0,0 +1,30 @@
+"""Room sweeper indexes
+
+Revision ID: 5b2d8e4f6a31
+Revises: e3a7f0c25d19
+Create Date: 2026-10-18 12:48:19.530772
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b2d8e4f6a31'
+down_revision: Union[str, None] = 'e3a7f0c25d19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_game_rooms_active_updated', 'game_rooms', ['is_active', 'updated_at'], unique=False)
+    op.create_index(op.f('ix_game_sessions_room_id'), 'game_sessions', ['room_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_game_sessions_room_id'), table_name='game_sessions')
+    op.drop_index('ix_game_rooms_active_updated', table_name='game_rooms')
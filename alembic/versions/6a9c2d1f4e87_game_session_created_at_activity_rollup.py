@@ -0,0 +1,85 @@
+"""game_sessions.created_at and game_activity_rollup
+
+Revision ID: 6a9c2d1f4e87
+Revises: 3f8a1c7e5b92
+Create Date: 2026-10-18 20:12:36.508214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a9c2d1f4e87'
+down_revision: Union[str, None] = '3f8a1c7e5b92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Bucket start per granularity; on SQLite in the text format SQLAlchemy stores DateTime in,
+# so the settlement upserts land on the backfilled rows
+BUCKETS = {
+    "sqlite": {
+        "hour": "strftime('%Y-%m-%d %H:00:00.000000', s.created_at)",
+        "day": "strftime('%Y-%m-%d 00:00:00.000000', s.created_at)",
+    },
+    "postgresql": {
+        "hour": "date_trunc('hour', s.created_at)",
+        "day": "date_trunc('day', s.created_at)",
+    },
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('game_sessions', sa.Column('created_at', sa.DateTime(), nullable=True))
+    # Existing sessions: the room's last update is when it was settled
+    op.execute(
+        "UPDATE game_sessions SET created_at = "
+        "(SELECT r.updated_at FROM game_rooms r WHERE r.id = game_sessions.room_id) "
+        "WHERE created_at IS NULL"
+    )
+    op.create_index(op.f('ix_game_sessions_created_at'), 'game_sessions', ['created_at'], unique=False)
+
+    op.create_table('game_activity_rollup',
+    sa.Column('game_type_id', sa.Integer(), nullable=False),
+    sa.Column('granularity', sa.String(), nullable=False),
+    sa.Column('bucket', sa.DateTime(), nullable=False),
+    sa.Column('matches', sa.Integer(), nullable=False),
+    sa.Column('sessions', sa.Integer(), nullable=False),
+    sa.Column('wins', sa.Integer(), nullable=False),
+    sa.Column('losses', sa.Integer(), nullable=False),
+    sa.Column('draws', sa.Integer(), nullable=False),
+    sa.Column('total_duration_seconds', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['game_type_id'], ['game_types.id'], ),
+    sa.PrimaryKeyConstraint('game_type_id', 'granularity', 'bucket')
+    )
+
+    # Backfill from the existing history: one match per room, its duration counted once
+    buckets = BUCKETS[op.get_bind().dialect.name]
+    for granularity, bucket in buckets.items():
+        op.execute(
+            "INSERT INTO game_activity_rollup "
+            "(game_type_id, granularity, bucket, matches, sessions, wins, losses, draws, total_duration_seconds) "
+            f"SELECT game_type_id, '{granularity}', bucket, COUNT(*), SUM(sessions), SUM(wins), SUM(losses), "
+            "SUM(draws), SUM(duration) FROM ("
+            f"SELECT r.game_type_id, {bucket} AS bucket, s.room_id, COUNT(s.id) AS sessions, "
+            "SUM(CASE WHEN s.result = 'win' THEN 1 ELSE 0 END) AS wins, "
+            "SUM(CASE WHEN s.result = 'loss' THEN 1 ELSE 0 END) AS losses, "
+            "SUM(CASE WHEN s.result = 'draw' THEN 1 ELSE 0 END) AS draws, "
+            "MAX(COALESCE(s.duration_seconds, 0)) AS duration "
+            "FROM game_sessions s JOIN game_rooms r ON s.room_id = r.id "
+            "WHERE s.created_at IS NOT NULL AND r.game_type_id IS NOT NULL "
+            f"GROUP BY r.game_type_id, {bucket}, s.room_id"
+            ") per_room GROUP BY game_type_id, bucket"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('game_activity_rollup')
+    op.drop_index(op.f('ix_game_sessions_created_at'), table_name='game_sessions')
+    with op.batch_alter_table('game_sessions') as batch_op:
+        batch_op.drop_column('created_at')
@@ -0,0 +1,28 @@
+"""Leaderboard ranking index
+
+Revision ID: 7c1e95a4d2b8
+Revises: 0040f41fb236
+Create Date: 2026-10-18 10:41:05.663021
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e95a4d2b8'
+down_revision: Union[str, None] = '0040f41fb236'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_leaderboard_game_type_wins', 'leaderboard', ['game_type_id', sa.text('wins DESC'), 'user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_leaderboard_game_type_wins', table_name='leaderboard')
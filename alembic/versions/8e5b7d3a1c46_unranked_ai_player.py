@@ -0,0 +1,39 @@
+"""Drop the AI player's leaderboard rows
+
+Revision ID: 8e5b7d3a1c46
+Revises: 6a9c2d1f4e87
+Create Date: 2026-10-18 23:05:47.118402
+
+Solo-room results of the AI player are recorded unranked from now on. Its
+existing leaderboard rows go; run python -m app.tools.recompute_ratings
+afterwards to take the solo matches out of the other players' ratings.
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e5b7d3a1c46'
+down_revision: Union[str, None] = '6a9c2d1f4e87'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Same default as app/services/game_logic.py
+AI_TELEGRAM_ID = int(os.getenv("AI_TELEGRAM_ID", "0"))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.get_bind().execute(
+        sa.text("DELETE FROM leaderboard WHERE user_id IN (SELECT id FROM users WHERE telegram_id = :ai)"),
+        {"ai": AI_TELEGRAM_ID},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The deleted rows are not restored: the counters stay in game_sessions
+    pass
@@ -0,0 +1,35 @@
+"""Leaderboard rating
+
+Revision ID: 9d41c6e2f7b3
+Revises: 5b2d8e4f6a31
+Create Date: 2026-10-18 15:02:37.114520
+
+Existing rows start at 1500; rebuild them from the game history with
+python -m app.tools.recompute_ratings
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d41c6e2f7b3'
+down_revision: Union[str, None] = '5b2d8e4f6a31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('leaderboard') as batch_op:
+        batch_op.add_column(sa.Column('rating', sa.Float(), server_default='1500', nullable=False))
+    op.create_index('ix_leaderboard_game_type_rating', 'leaderboard', ['game_type_id', sa.text('rating DESC'), 'user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_leaderboard_game_type_rating', table_name='leaderboard')
+    with op.batch_alter_table('leaderboard') as batch_op:
+        batch_op.drop_column('rating')
@@ -0,0 +1,45 @@
+"""game_sessions.match_id
+
+Revision ID: b5e3a9d7c214
+Revises: 4d7f2b9e6a13
+Create Date: 2026-10-19 00:12:08.734115
+
+Existing sessions get the id of the first session of their match, matches
+being the runs of consecutive sessions (in id order) of the same room with
+the same settle time, as recompute_ratings grouped them until now.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e3a9d7c214'
+down_revision: Union[str, None] = '4d7f2b9e6a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_CHUNK = 10_000
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('game_sessions', sa.Column('match_id', sa.BigInteger(), nullable=True))
+
+    bind = op.get_bind()
+    rows = bind.execute(sa.text("SELECT id, room_id, created_at FROM game_sessions ORDER BY id")).fetchall()
+    updates, last, match_id = [], None, None
+    for session_id, room_id, created_at in rows:
+        if (room_id, created_at) != last:
+            last, match_id = (room_id, created_at), session_id
+        updates.append({"b_id": session_id, "b_match_id": match_id})
+    stmt = sa.text("UPDATE game_sessions SET match_id = :b_match_id WHERE id = :b_id")
+    for i in range(0, len(updates), BACKFILL_CHUNK):
+        bind.execute(stmt, updates[i:i + BACKFILL_CHUNK])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('game_sessions') as batch_op:
+        batch_op.drop_column('match_id')
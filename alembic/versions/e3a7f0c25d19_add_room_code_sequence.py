@@ -0,0 +1,33 @@
+"""Add room_code_sequence
+
+Revision ID: e3a7f0c25d19
+Revises: 7c1e95a4d2b8
+Create Date: 2026-10-18 11:26:52.807314
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a7f0c25d19'
+down_revision: Union[str, None] = '7c1e95a4d2b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    room_code_sequence = op.create_table('room_code_sequence',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('next_value', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(room_code_sequence, [{'id': 1, 'next_value': 0}])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('room_code_sequence')
@@ -1,9 +1,19 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+import logging
 import os
+import time
 from dotenv import load_dotenv
 
+from . import metrics
+
 load_dotenv()
 
 # Ottieni la connessione al database dal file .env
@@ -11,11 +21,297 @@ SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./game.db")
 
 SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("\\x3a", ":")
 
+# Async mode: route handlers await an AsyncSession instead of taking a threadpool slot
+USE_ASYNC_DB = os.getenv("ASYNC_DB", "false").lower() in ("1", "true", "yes")
+
+# Async drivers used when DATABASE_URL names a sync one
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def to_async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", to_async_url(SQLALCHEMY_DATABASE_URL))
+
+# Optional read replica for the GET routes (stats, leaderboard); unset: read-only pool on the primary
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL", "").replace("\\x3a", ":") or None
+ASYNC_READ_DATABASE_URL = os.getenv(
+    "ASYNC_READ_DATABASE_URL", to_async_url(READ_DATABASE_URL) if READ_DATABASE_URL else ""
+) or None
+
+# Read-your-writes: after a commit the client's reads stay on the primary for this long (replica lag bound)
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", "5"))
+DB_PIN_COOKIE = "db_pin"
+
+# Engine profiles: pragmas run on every new SQLite connection.
+# "default" keeps SQLite's own settings (rollback journal: readers and the writer block each other);
+# "production" switches to WAL, where readers never block the writer and commits skip most fsyncs.
+DB_PROFILES = {
+    "default": {},
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,  # ms a writer waits for the lock before "database is locked"
+        "cache_size": -65536,  # negative: KiB, i.e. 64 MB of page cache per connection
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+    },
+}
+DB_PROFILE = os.getenv("DB_PROFILE", "default")
+if DB_PROFILE not in DB_PROFILES:
+    raise ValueError(f"Unknown DB_PROFILE {DB_PROFILE!r}, expected one of {sorted(DB_PROFILES)}")
+
+# Per-pragma overrides of the profile, e.g. SQLITE_PRAGMAS=busy_timeout=10000,mmap_size=0
+SQLITE_PRAGMAS = dict(
+    item.split("=", 1) for item in os.getenv("SQLITE_PRAGMAS", "").replace(" ", "").split(",") if item
+)
+
+# Connection pools (QueuePool): the write engine and the read-only engine used by stats/leaderboard
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "10"))
+DB_READ_MAX_OVERFLOW = int(os.getenv("DB_READ_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def is_memory_sqlite(url: str) -> bool:
+    return is_sqlite(url) and (url.partition("://")[2] in ("", "/") or ":memory:" in url or "mode=memory" in url)
+
+
+def sqlite_pragmas(profile: str = DB_PROFILE, readonly: bool = False) -> dict:
+    pragmas = {**DB_PROFILES[profile], **SQLITE_PRAGMAS}
+    if readonly:
+        # The journal mode is a property of the file, set by the writer; a read-only connection can't change it
+        pragmas.pop("journal_mode", None)
+        pragmas["query_only"] = "ON"
+    return pragmas
+
+
+def configure_sqlite(target, pragmas: dict):
+    """Run pragmas on every new DBAPI connection of target (an Engine or an async engine's sync_engine)."""
+    if not pragmas:
+        return
+
+    @event.listens_for(target, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def make_engine(url: str, profile: str = DB_PROFILE, readonly: bool = False, async_: bool = False):
+    """Engine for url with the profile's pragmas and pool sizing (the read pool if readonly)."""
+    kwargs = {}
+    if is_sqlite(url):
+        kwargs["connect_args"] = {"check_same_thread": False}
+    if not is_memory_sqlite(url):
+        kwargs.update(
+            pool_size=DB_READ_POOL_SIZE if readonly else DB_POOL_SIZE,
+            max_overflow=DB_READ_MAX_OVERFLOW if readonly else DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+    if async_:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        new_engine = create_async_engine(url, **kwargs)
+        sync_target = new_engine.sync_engine
+    else:
+        new_engine = sync_target = create_engine(url, **kwargs)
+    if is_sqlite(url):
+        configure_sqlite(sync_target, sqlite_pragmas(profile, readonly))
+    return new_engine
+
+
 # Crea l'engine per la connessione
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
 
 # Sessione per le query
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Read-only sessions for stats/leaderboard reads: the replica if READ_DATABASE_URL is set, else their own
+# pool on the primary, so they never queue behind settlement writes for a connection.
+# An in-memory database can't be opened twice: it shares the engine.
+if READ_DATABASE_URL:
+    read_engine = make_engine(READ_DATABASE_URL, readonly=True)
+elif is_memory_sqlite(SQLALCHEMY_DATABASE_URL):
+    read_engine = engine
+else:
+    read_engine = make_engine(SQLALCHEMY_DATABASE_URL, readonly=True)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# Async engine/session, only built when enabled (needs greenlet + an async driver such as aiosqlite)
+async_engine = None
+AsyncSessionLocal = None
+async_read_engine = None
+AsyncReadSessionLocal = None
+if USE_ASYNC_DB:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+    async_engine = make_engine(ASYNC_DATABASE_URL, async_=True)
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    if ASYNC_READ_DATABASE_URL:
+        async_read_engine = make_engine(ASYNC_READ_DATABASE_URL, readonly=True, async_=True)
+    elif is_memory_sqlite(ASYNC_DATABASE_URL):
+        async_read_engine = async_engine
+    else:
+        async_read_engine = make_engine(ASYNC_DATABASE_URL, readonly=True, async_=True)
+    AsyncReadSessionLocal = async_sessionmaker(
+        async_read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+    )
+
 # Base per i modelli
 Base = declarative_base()
+
+
+read_sessions = metrics.Counter("db_read_sessions_total", "Sessions opened by read routes", ["target"])
+
+
+@asynccontextmanager
+async def _open_session(factory, async_factory):
+    if async_factory is not None:
+        async with async_factory() as db:
+            yield db
+    else:
+        db = factory()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+
+# Dependency: yields an AsyncSession in async mode, a plain Session otherwise
+async def get_db():
+    async with _open_session(SessionLocal, AsyncSessionLocal) as db:
+        yield db
+
+
+@event.listens_for(Session, "after_commit")
+def _pin_to_primary(session):
+    # Set by get_write_db: a committed write pins the client's reads to the primary for a while
+    response = session.info.get("response")
+    if response is not None:
+        until = time.time() + READ_YOUR_WRITES_WINDOW
+        response.set_cookie(DB_PIN_COOKIE, f"{until:.3f}", max_age=int(READ_YOUR_WRITES_WINDOW) + 1, httponly=True)
+
+
+# Dependency for mutating routes: a primary session; with a replica configured, a commit pins the client
+async def get_write_db(response: Response):
+    async with _open_session(SessionLocal, AsyncSessionLocal) as db:
+        if READ_DATABASE_URL and READ_YOUR_WRITES_WINDOW > 0:
+            db.info["response"] = response
+        yield db
+
+
+def _pinned(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(DB_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+# Dependency for read-only routes: the replica or read pool (a write fails with "attempt to write a readonly
+# database"), or the primary while the client is pinned by a recent write
+async def get_read_db(request: Request):
+    if READ_DATABASE_URL and _pinned(request):
+        read_sessions.inc(target="primary")
+        factories = SessionLocal, AsyncSessionLocal
+    else:
+        read_sessions.inc(target="replica" if READ_DATABASE_URL else "read_pool")
+        factories = ReadSessionLocal, AsyncReadSessionLocal
+    async with _open_session(*factories) as db:
+        yield db
+
+
+async def run_db(db, fn, *args, **kwargs):
+    """
+    Run fn(session, *args) without blocking the event loop.
+    AsyncSession runs it on the async driver, a sync Session in the threadpool.
+    """
+    if AsyncSessionLocal is not None:
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+
+async def run_in_session(fn, *args, **kwargs):
+    """Like run_db, for background tasks: opens and closes its own session around fn."""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(fn, *args, **kwargs)
+
+    def call():
+        with SessionLocal() as db:
+            return fn(db, *args, **kwargs)
+
+    return await run_in_threadpool(call)
+
+
+# --- Query instrumentation ---
+
+logger = logging.getLogger("uvicorn")
+
+# Statements slower than this (seconds) go to the slow query log; SLOW_QUERY_LOG_SIZE most recent are kept
+SLOW_QUERY_THRESHOLD = float(os.getenv("SLOW_QUERY_THRESHOLD", "0.1"))
+SLOW_QUERY_LOG_SIZE = int(os.getenv("SLOW_QUERY_LOG_SIZE", "100"))
+
+# [statements, seconds] of the current request, set by the request metrics middleware.
+# A mutable list: the threadpool and run_sync see a copy of the context, not a new value.
+request_queries: ContextVar = ContextVar("request_queries", default=None)
+
+slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+queries_total = metrics.Counter("db_queries_total", "SQL statements executed")
+query_seconds_total = metrics.Counter("db_query_seconds_total", "Time spent executing SQL statements")
+slow_queries_total = metrics.Counter("db_slow_queries_total", "SQL statements slower than SLOW_QUERY_THRESHOLD")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    queries_total.inc()
+    query_seconds_total.inc(elapsed)
+    stats = request_queries.get()
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += elapsed
+    if elapsed >= SLOW_QUERY_THRESHOLD:
+        slow_queries_total.inc()
+        slow_queries.append({
+            "at": time.time(),
+            "seconds": round(elapsed, 6),
+            "statement": statement,
+            "executemany": executemany,
+        })
+        logger.warning(f"Slow query ({elapsed * 1000:.1f} ms): {' '.join(statement.split())[:200]}")
+
+
+def _handle_error(exception_context):
+    # No after_cursor_execute for a failed statement: drop its start time
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start") and exception_context.execution_context is not None:
+        conn.info["query_start"].pop()
+
+
+def instrument(target):
+    """Time every statement run on target (an Engine or its sync_engine)."""
+    event.listen(target, "before_cursor_execute", _before_cursor_execute)
+    event.listen(target, "after_cursor_execute", _after_cursor_execute)
+    event.listen(target, "handle_error", _handle_error)
+
+
+for _target in {engine, read_engine}:
+    instrument(_target)
+for _target in {async_engine, async_read_engine} - {None}:
+    instrument(_target.sync_engine)
@@ -1 +1,12 @@
-from .tris import validate_move, check_winner
+from typing import Optional
+
+from .base import GameEngine
+from .rps import RpsEngine
+from .tris import TrisEngine, validate_move, check_winner
+
+# Engine lookup table: game_types.name -> engine instance
+ENGINES = {engine.name: engine for engine in (RpsEngine(), TrisEngine())}
+
+
+def get_engine(game_type: str) -> Optional[GameEngine]:
+    return ENGINES.get(game_type)
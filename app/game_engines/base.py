@@ -0,0 +1,61 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+# A room's state is the field dict kept in the room store (see services/room_store.py)
+State = Dict[str, str]
+
+
+class GameEngine(ABC):
+    """
+    Common interface for the games served by /game/{type}/move and /game/{type}/settle.
+    Engines are stateless singletons: every call receives the room state and
+    apply_move returns the new one, so the same instance serves every room.
+    ai_seat and ai_move are only needed by engines with has_ai.
+    """
+
+    # game_types.name this engine plays
+    name = ""
+    # True if ai_move can play a side (solo rooms)
+    has_ai = False
+
+    @abstractmethod
+    def validate_move(self, state: State, player_id: int, move: str) -> Optional[str]:
+        """None if the move is legal, otherwise the reason it is not."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def apply_move(self, state: State, player_id: int, move: str) -> State:
+        raise NotImplementedError
+
+    @abstractmethod
+    def is_terminal(self, state: State) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def outcome(self, state: State) -> Dict[int, str]:
+        """player_id -> "win" / "loss" / "draw" for a terminal state."""
+        raise NotImplementedError
+
+    def score(self, result: str) -> int:
+        return 1 if result == "win" else 0
+
+    @abstractmethod
+    def players(self, state: State) -> list:
+        raise NotImplementedError
+
+    @abstractmethod
+    def seat_players(self, state: State, player_ids: list) -> State:
+        """Initial state of a room whose players are known upfront (matchmaking): only they can move."""
+        raise NotImplementedError
+
+    def ai_seat(self, state: State, player_id: int, ai_id: int) -> State:
+        """Initial state of a solo room: player_id against the AI."""
+        raise NotImplementedError
+
+    def ai_move(self, state: State) -> str:
+        """The AI's move for the player to move in a non-terminal state."""
+        raise NotImplementedError
+
+    def summary(self, state: State) -> dict:
+        """Public view of the state, returned to the clients."""
+        return {}
@@ -2,6 +2,8 @@
 
 from typing import Dict, Optional
 
+from .base import GameEngine, State
+
 CHOICES = ["rock", "paper", "scissors"]
 
 # Regole: cosa batte cosa
@@ -29,3 +31,52 @@ def play(p1_choice: str, p2_choice: str) -> Dict[str, Optional[str]]:
         return {"result": "p1"}
     else:
         return {"result": "p2"}
+
+
+class RpsEngine(GameEngine):
+    """
+    Rock-paper-scissors: state is {str(player_id): move}, over once both players moved.
+    A matched room also has "seats" (the two player ids, comma separated): nobody else can move there.
+    """
+
+    name = "rps"
+
+    @staticmethod
+    def _moves(state: State) -> State:
+        return {p: move for p, move in state.items() if p != "seats"}
+
+    def validate_move(self, state: State, player_id: int, move: str) -> Optional[str]:
+        if move.lower() not in CHOICES:
+            return f"Invalid move, choose one of: {', '.join(CHOICES)}"
+        if "seats" in state and str(player_id) not in state["seats"].split(","):
+            return "Not a player of this room"
+        moves = self._moves(state)
+        if str(player_id) not in moves and len(moves) >= 2:
+            return "Room is full"
+        return None
+
+    def apply_move(self, state: State, player_id: int, move: str) -> State:
+        return {**state, str(player_id): move.lower()}
+
+    def is_terminal(self, state: State) -> bool:
+        return len(self._moves(state)) >= 2
+
+    def players(self, state: State) -> list:
+        if "seats" in state:
+            return [int(p) for p in state["seats"].split(",")]
+        return [int(p) for p in self._moves(state)]
+
+    def outcome(self, state: State) -> Dict[int, str]:
+        (p1, move1), (p2, move2) = list(self._moves(state).items())[:2]
+        winner = play(move1, move2).get("result")
+        if winner == "draw":
+            return {int(p1): "draw", int(p2): "draw"}
+        if winner == "p1":
+            return {int(p1): "win", int(p2): "loss"}
+        return {int(p1): "loss", int(p2): "win"}
+
+    def seat_players(self, state: State, player_ids: list) -> State:
+        return {**state, "seats": ",".join(str(p) for p in player_ids)}
+
+    def summary(self, state: State) -> dict:
+        return {"moves": [[int(p), move] for p, move in self._moves(state).items()]}
@@ -1,7 +1,169 @@
-def validate_move(game_state, move):
-    # Validazione del movimento per il gioco del tris
-    return True
+# game_engines/tris.py
 
-def check_winner(game_state):
-    # Logica per verificare se qualcuno ha vinto
-    return "X" if game_state['board'] == ['X', 'X', 'X'] else None
+from typing import Dict, Optional, Tuple
+
+from .base import GameEngine, State
+
+# Bitboard: bit i is cell i, row-major
+#   0 | 1 | 2
+#   3 | 4 | 5
+#   6 | 7 | 8
+# A board is the two 9-bit player masks packed in one int: x | o << 9
+CELLS = 9
+FULL = (1 << CELLS) - 1
+
+WIN_MASKS = (
+    0b000000111, 0b000111000, 0b111000000,  # rows
+    0b001001001, 0b010010010, 0b100100100,  # columns
+    0b100010001, 0b001010100,               # diagonals
+)
+
+# Every 9-bit mask -> does it contain a line, so winner checks are one list lookup
+IS_WIN = [any(mask & line == line for line in WIN_MASKS) for mask in range(1 << CELLS)]
+
+POPCOUNT = [bin(mask).count("1") for mask in range(1 << CELLS)]
+
+
+def pack(x: int, o: int) -> int:
+    return x | o << CELLS
+
+
+def unpack(board: int) -> Tuple[int, int]:
+    return board & FULL, board >> CELLS
+
+
+def to_move(board: int) -> str:
+    x, o = unpack(board)
+    return "x" if POPCOUNT[x] == POPCOUNT[o] else "o"
+
+
+def validate_move(board: int, cell: int) -> Optional[str]:
+    """None if cell can be played on board, otherwise the reason it can't."""
+    if not 0 <= cell < CELLS:
+        return "Invalid cell, choose 0-8"
+    x, o = unpack(board)
+    if check_winner(board) or x | o == FULL:
+        return "Game is over"
+    if (x | o) >> cell & 1:
+        return "Cell already taken"
+    return None
+
+
+def play(board: int, cell: int) -> int:
+    """Board after the side to move plays cell (no validation)."""
+    if to_move(board) == "x":
+        return board | 1 << cell
+    return board | 1 << (cell + CELLS)
+
+
+def check_winner(board: int) -> Optional[str]:
+    x, o = unpack(board)
+    if IS_WIN[x]:
+        return "x"
+    if IS_WIN[o]:
+        return "o"
+    return None
+
+
+def is_terminal(board: int) -> bool:
+    x, o = unpack(board)
+    return IS_WIN[x] or IS_WIN[o] or x | o == FULL
+
+
+def render(board: int) -> str:
+    """9 chars, "X", "O" or "." per cell."""
+    x, o = unpack(board)
+    return "".join("X" if x >> i & 1 else "O" if o >> i & 1 else "." for i in range(CELLS))
+
+
+def parse_cell(move: str) -> Optional[int]:
+    """Moves are a cell index "0".."8" or "row,col" with 0-based row and column."""
+    move = move.strip()
+    try:
+        if "," in move:
+            row, col = (int(part) for part in move.split(","))
+            return row * 3 + col if 0 <= row < 3 and 0 <= col < 3 else None
+        return int(move)
+    except ValueError:
+        return None
+
+
+class TrisEngine(GameEngine):
+    """
+    Tic-tac-toe: state is {"board": packed bitboard, "x": player_id, "o": player_id}.
+    The first player to move is X, the next one to join is O.
+    """
+
+    name = "tris"
+    has_ai = True
+
+    @staticmethod
+    def _board(state: State) -> int:
+        return int(state.get("board", "0"))
+
+    def _side(self, state: State, player_id: int) -> Optional[str]:
+        if state.get("x") == str(player_id):
+            return "x"
+        if state.get("o") == str(player_id):
+            return "o"
+        if "x" not in state:
+            return "x"
+        if "o" not in state:
+            return "o"
+        return None
+
+    def validate_move(self, state: State, player_id: int, move: str) -> Optional[str]:
+        cell = parse_cell(move)
+        if cell is None:
+            return "Invalid move, send a cell 0-8 or row,col"
+        side = self._side(state, player_id)
+        if side is None:
+            return "Room is full"
+        board = self._board(state)
+        if side != to_move(board):
+            return "Not your turn"
+        return validate_move(board, cell)
+
+    def apply_move(self, state: State, player_id: int, move: str) -> State:
+        board = self._board(state)
+        side = self._side(state, player_id)
+        return {**state, side: str(player_id), "board": str(play(board, parse_cell(move)))}
+
+    def is_terminal(self, state: State) -> bool:
+        return is_terminal(self._board(state))
+
+    def players(self, state: State) -> list:
+        return [int(state[side]) for side in ("x", "o") if side in state]
+
+    def outcome(self, state: State) -> Dict[int, str]:
+        x, o = int(state["x"]), int(state["o"])
+        winner = check_winner(self._board(state))
+        if winner is None:
+            return {x: "draw", o: "draw"}
+        if winner == "x":
+            return {x: "win", o: "loss"}
+        return {x: "loss", o: "win"}
+
+    def seat_players(self, state: State, player_ids: list) -> State:
+        x, o = player_ids
+        return {**state, "x": str(x), "o": str(o)}
+
+    def ai_seat(self, state: State, player_id: int, ai_id: int) -> State:
+        # The human moves first as X
+        return self.seat_players(state, [player_id, ai_id])
+
+    def ai_move(self, state: State) -> str:
+        from .tris_ai import ai_move  # tris_ai imports this module
+        return str(ai_move(self._board(state)))
+
+    def summary(self, state: State) -> dict:
+        board = self._board(state)
+        winner = check_winner(board)
+        next_side = None if is_terminal(board) else to_move(board)
+        return {
+            "board": render(board),
+            "x": int(state["x"]) if "x" in state else None,
+            "o": int(state["o"]) if "o" in state else None,
+            "next": int(state[next_side]) if next_side and next_side in state else None,
+            "winner": int(state[winner]) if winner else None,
+        }
@@ -0,0 +1,182 @@
+# game_engines/tris_ai.py
+
+import os
+import struct
+import threading
+from typing import Dict, Optional, Tuple
+
+from .tris import CELLS, FULL, IS_WIN, POPCOUNT, pack, to_move, unpack
+
+# Optional on-disk copy of the move table: loaded if present, written after a build otherwise
+TRIS_AI_TABLE = os.getenv("TRIS_AI_TABLE", "")
+
+# The 8 symmetries of the 3x3 grid as cell permutations: SYMMETRIES[s][i] is where cell i goes
+_rotate = lambda i: (i % 3) * 3 + 2 - i // 3  # noqa: E731  (r, c) -> (c, 2 - r)
+_mirror = lambda i: i // 3 * 3 + 2 - i % 3    # noqa: E731  (r, c) -> (r, 2 - c)
+
+
+def _symmetries():
+    perms, perm = [], list(range(CELLS))
+    for _ in range(4):
+        perms.append(perm)
+        perms.append([_mirror(i) for i in perm])
+        perm = [_rotate(i) for i in perm]
+    return perms
+
+
+SYMMETRIES = _symmetries()
+INVERSE = [[perm.index(i) for i in range(CELLS)] for perm in SYMMETRIES]
+
+# SYM_MASK[s][mask]: a 9-bit mask under symmetry s, so canonicalizing a board is 16 list lookups
+SYM_MASK = [
+    [sum(1 << perm[i] for i in range(CELLS) if mask >> i & 1) for mask in range(1 << CELLS)]
+    for perm in SYMMETRIES
+]
+
+# Center, corners, edges: the strong moves first, so alpha-beta cuts early
+MOVE_ORDER = (4, 0, 2, 6, 8, 1, 3, 5, 7)
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+def canonical(me: int, opp: int) -> Tuple[int, int]:
+    """Smallest packed (me, opp) over the 8 symmetries, and the symmetry that produces it."""
+    best, best_s = None, 0
+    for s, table in enumerate(SYM_MASK):
+        key = pack(table[me], table[opp])
+        if best is None or key < best:
+            best, best_s = key, s
+    return best, best_s
+
+
+class TrisSolver:
+    """
+    Negamax with alpha-beta over (side to move, opponent) masks.
+    The transposition table is keyed by the canonical position, so the 8
+    symmetric variants of a board share one entry.
+    Scores are from the side to move: 0 draw, otherwise +/-(1 + empty cells)
+    so faster wins and slower losses score better.
+    """
+
+    def __init__(self):
+        self.tt: Dict[int, Tuple[int, int]] = {}
+
+    def negamax(self, me: int, opp: int, alpha: int = -CELLS - 1, beta: int = CELLS + 1) -> int:
+        empty = CELLS - POPCOUNT[me | opp]
+        if IS_WIN[opp]:
+            return -(1 + empty)
+        if not empty:
+            return 0
+
+        key = canonical(me, opp)[0]
+        entry = self.tt.get(key)
+        if entry is not None:
+            value, flag = entry
+            if flag == EXACT:
+                return value
+            if flag == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+
+        alpha_orig, best = alpha, -CELLS - 1
+        taken = me | opp
+        for cell in MOVE_ORDER:
+            if taken >> cell & 1:
+                continue
+            value = -self.negamax(opp, me | 1 << cell, -beta, -alpha)
+            if value > best:
+                best = value
+            if best > alpha:
+                alpha = best
+            if alpha >= beta:
+                break
+
+        flag = UPPER if best <= alpha_orig else LOWER if best >= beta else EXACT
+        self.tt[key] = (best, flag)
+        return best
+
+    def best_move(self, me: int, opp: int) -> int:
+        taken, best, best_cell = me | opp, None, None
+        for cell in MOVE_ORDER:
+            if taken >> cell & 1:
+                continue
+            value = -self.negamax(opp, me | 1 << cell)
+            if best is None or value > best:
+                best, best_cell = value, cell
+        return best_cell
+
+    def build_table(self) -> Dict[int, int]:
+        """Best cell for every reachable canonical non-terminal position, in canonical coordinates."""
+        table, stack = {}, [(0, 0)]
+        while stack:
+            me, opp = stack.pop()
+            key = canonical(me, opp)[0]
+            if key in table or IS_WIN[opp] or me | opp == FULL:
+                continue
+            canon_me, canon_opp = key & FULL, key >> CELLS
+            table[key] = self.best_move(canon_me, canon_opp)
+            taken = me | opp
+            stack.extend((opp, me | 1 << cell) for cell in range(CELLS) if not taken >> cell & 1)
+        return table
+
+
+# File layout: b"TRAI", entry count, then (uint32 canonical key, uint8 cell) per entry
+_MAGIC = b"TRAI"
+_ENTRY = struct.Struct("<IB")
+
+
+def save_table(table: Dict[int, int], path: str):
+    with open(path, "wb") as f:
+        f.write(_MAGIC + struct.pack("<I", len(table)))
+        f.write(b"".join(_ENTRY.pack(key, cell) for key, cell in sorted(table.items())))
+
+
+def load_table(path: str) -> Dict[int, int]:
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != _MAGIC:
+        raise ValueError(f"{path} is not a tris AI table")
+    (count,) = struct.unpack_from("<I", data, 4)
+    return dict(_ENTRY.iter_unpack(data[8:8 + count * _ENTRY.size]))
+
+
+_table: Optional[Dict[int, int]] = None
+_table_lock = threading.Lock()
+
+
+def load_or_build(path: str = TRIS_AI_TABLE) -> Dict[int, int]:
+    """The move table, built once per process (called from the app lifespan)."""
+    global _table
+    with _table_lock:
+        if _table is None:
+            if path and os.path.exists(path):
+                _table = load_table(path)
+            else:
+                _table = TrisSolver().build_table()
+                if path:
+                    save_table(_table, path)
+        return _table
+
+
+def ai_move(board: int) -> Optional[int]:
+    """Best cell for the side to move on board, None if the game is over."""
+    table = _table if _table is not None else load_or_build()
+    x, o = unpack(board)
+    me, opp = (x, o) if to_move(board) == "x" else (o, x)
+    key, s = canonical(me, opp)
+    cell = table.get(key)
+    return None if cell is None else INVERSE[s][cell]
+
+
+if __name__ == "__main__":
+    # python -m app.game_engines.tris_ai tris_ai.bin
+    import sys
+    import time
+
+    t0 = time.perf_counter()
+    table = TrisSolver().build_table()
+    save_table(table, sys.argv[1])
+    print(f"{len(table)} positions in {time.perf_counter() - t0:.3f}s -> {sys.argv[1]}")
@@ -1,9 +1,90 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
+from .database import request_queries
+from .metrics import Counter, Histogram
 from .routers import game, auth, debug  # ← NEW
 from .routers import stats  # ← NEW
+from .routers import export, metrics
+from .game_engines import tris_ai
+from .services import event_log, matchmaking, sweeper
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Tris AI move table: built (or loaded from TRIS_AI_TABLE) before the first request
+    await asyncio.to_thread(tris_ai.load_or_build)
+
+    # Write-behind settlement: replay what the tables are missing (e.g. after a crash) before serving
+    if event_log.EVENT_LOG_ENABLED:
+        await event_log.start()
+
+    # Background jobs live as long as the worker
+    tasks = []
+    if event_log.log is not None:
+        tasks.append(asyncio.create_task(event_log.run_applier()))
+    if sweeper.ROOM_SWEEPER_ENABLED:
+        tasks.append(asyncio.create_task(sweeper.run_sweeper()))
+    if matchmaking.MATCHMAKING_ENABLED:
+        tasks.append(asyncio.create_task(matchmaking.run_matchmaker()))
+    yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    if event_log.log is not None:
+        await event_log.stop()
+
+
+request_latency = Histogram("http_request_duration_seconds", "Request latency", ["method", "route"])
+requests_total = Counter("http_requests_total", "Requests served", ["method", "route", "status"])
+request_queries_hist = Histogram(
+    "http_request_db_queries", "SQL statements per request", ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+request_query_seconds = Histogram("http_request_db_seconds", "SQL time per request", ["route"])
+
+
+class RequestMetricsMiddleware:
+    """
+    Latency, status and SQL statement count/time per route template (so /game/{game_type}/move is one series).
+    Plain ASGI rather than BaseHTTPMiddleware: no extra task per request, and SSE responses stream through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        stats = [0, 0.0]
+        token = request_queries.set(stats)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            request_queries.reset(token)
+            route = scope.get("route")
+            route = route.path if route is not None else "unmatched"
+            request_latency.observe(elapsed, method=scope["method"], route=route)
+            requests_total.inc(method=scope["method"], route=route, status=status)
+            request_queries_hist.observe(stats[0], route=route)
+            request_query_seconds.observe(stats[1], route=route)
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,7 +94,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added last, so it is the outermost middleware and its timing includes CORS
+app.add_middleware(RequestMetricsMiddleware)
+
 app.include_router(auth.router)
 app.include_router(game.router)
 app.include_router(stats.router)
 app.include_router(debug.router)  # ← NEW
+app.include_router(export.router)
+app.include_router(metrics.router)
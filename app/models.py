@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey, Boolean, DateTime, Float, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import datetime
@@ -31,15 +31,31 @@ class GameRoom(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Room sweeper: oldest rooms per state first
+    __table_args__ = (Index("ix_game_rooms_active_updated", "is_active", "updated_at"),)
+
+
+class RoomCodeSequence(Base):
+    """Single-row counter that room code blocks are reserved from."""
+    __tablename__ = "room_code_sequence"
+    id = Column(Integer, primary_key=True)
+    next_value = Column(Integer, nullable=False, default=0)
+    # Secret of the code permutation, random per database (see services/room_codes.py)
+    code_key = Column(String, nullable=True)
+
 
 class GameSession(Base):
     __tablename__ = "game_sessions"
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    room_id = Column(Integer, ForeignKey("game_rooms.id"))
+    room_id = Column(Integer, ForeignKey("game_rooms.id"), index=True)
     result = Column(String)
     score = Column(Integer)
     duration_seconds = Column(Integer)
+    # When the match was settled (set by record_results; rows older than the column: the room's updated_at)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    # Shared by the sessions of one match (random, set by record_results)
+    match_id = Column(BigInteger)
     
     user = relationship("User", back_populates="game_sessions")
     room = relationship("GameRoom", back_populates="sessions")
@@ -47,13 +63,65 @@ class GameSession(Base):
 
 class LeaderboardEntry(Base):
     __tablename__ = "leaderboard"
+    # One row per (user, game type): the key the settlement upsert conflicts on
+    __table_args__ = (UniqueConstraint("user_id", "game_type_id", name="uq_leaderboard_user_game_type"),)
+
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     game_type_id = Column(Integer, ForeignKey("game_types.id"))
     wins = Column(Integer, default=0)
     losses = Column(Integer, default=0)
     draws = Column(Integer, default=0)
+    # Elo rating, updated on each settled 1v1 match (services/ratings.py)
+    rating = Column(Float, nullable=False, default=1500.0, server_default="1500")
 
     user = relationship("User")
     game_type = relationship("GameType")
 
+
+# Ranking order (wins desc, user_id asc) for top-K pages and rank counts
+Index(
+    "ix_leaderboard_game_type_wins",
+    LeaderboardEntry.game_type_id, LeaderboardEntry.wins.desc(), LeaderboardEntry.user_id,
+)
+# Same, ranking by skill (rating desc, user_id asc)
+Index(
+    "ix_leaderboard_game_type_rating",
+    LeaderboardEntry.game_type_id, LeaderboardEntry.rating.desc(), LeaderboardEntry.user_id,
+)
+
+
+class UserGameStats(Base):
+    """Per-user, per-game-type totals, maintained at settlement so stats are a primary-key read."""
+    __tablename__ = "user_game_stats"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    game_type_id = Column(Integer, ForeignKey("game_types.id"), primary_key=True)
+    total_games = Column(Integer, nullable=False, default=0)
+    wins = Column(Integer, nullable=False, default=0)
+    losses = Column(Integer, nullable=False, default=0)
+    draws = Column(Integer, nullable=False, default=0)
+    total_score = Column(Integer, nullable=False, default=0)
+
+
+class GameActivityRollup(Base):
+    """
+    Per game type and time bucket (hour or day, UTC) counters, maintained at
+    settlement: time series read a handful of rows instead of scanning game_sessions.
+    """
+    __tablename__ = "game_activity_rollup"
+    game_type_id = Column(Integer, ForeignKey("game_types.id"), primary_key=True)
+    granularity = Column(String, primary_key=True)  # "hour" or "day"
+    bucket = Column(DateTime, primary_key=True)  # bucket start
+    matches = Column(Integer, nullable=False, default=0)
+    sessions = Column(Integer, nullable=False, default=0)
+    wins = Column(Integer, nullable=False, default=0)
+    losses = Column(Integer, nullable=False, default=0)
+    draws = Column(Integer, nullable=False, default=0)
+    total_duration_seconds = Column(Integer, nullable=False, default=0)
+
+
+class EventLogCheckpoint(Base):
+    """Last event log record applied to the tables (services/event_log.py): a single row, id 1."""
+    __tablename__ = "event_log_checkpoint"
+    id = Column(Integer, primary_key=True)
+    applied_seq = Column(BigInteger, nullable=False, default=0)
@@ -1,8 +1,19 @@
 import os
 from fastapi import APIRouter
+from ..database import SLOW_QUERY_THRESHOLD, slow_queries
+from ..services.cache import cache_stats
 
 router = APIRouter(prefix="/debug", tags=["debug"])
 
 @router.get("/db-path")
 def get_db_path():
     return {"DATABASE_URL": os.getenv("DATABASE_URL", "sqlite:///./game.db")}
+
+@router.get("/cache")
+def get_cache_stats():
+    return cache_stats()
+
+# Most recent statements slower than SLOW_QUERY_THRESHOLD (counts and totals are in /metrics)
+@router.get("/slow-queries")
+def get_slow_queries():
+    return {"threshold_seconds": SLOW_QUERY_THRESHOLD, "queries": list(reversed(slow_queries))}
@@ -0,0 +1,57 @@
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from ..database import get_read_db, run_db
+from ..services import cache, export
+
+router = APIRouter(prefix="/api/export", tags=["export"])
+
+# Streaming exports for analytics (NDJSON or CSV), read from the replica / read pool.
+# Rows go out chunk by chunk as they are fetched: memory stays flat on tables of any size.
+# The session lives until the last byte is sent (dependency scope "request"): with the default
+# SQLite profile a long export holds a read lock that blocks writers, use DB_PROFILE=production (WAL)
+# or a replica.
+
+FORMAT_PATTERN = "^(ndjson|csv)$"
+
+
+async def _game_type_id(db, game_type: Optional[str]):
+    if game_type is None:
+        return None
+    game_type_id = await run_db(db, cache.get_game_type_id, game_type)
+    if not game_type_id:
+        raise HTTPException(status_code=404, detail="Game not found")
+    return game_type_id
+
+
+def _stream(db, query, fmt: str, name: str, rank: bool = False):
+    return StreamingResponse(
+        export.stream_export(db, query, fmt, rank),
+        media_type=export.FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+
+# since/until filter on when the match was settled (ISO 8601, UTC)
+@router.get("/sessions")
+async def export_sessions(game_type: Optional[str] = None, since: Optional[datetime] = None,
+                          until: Optional[datetime] = None, format: str = Query("ndjson", pattern=FORMAT_PATTERN),
+                          db=Depends(get_read_db)):
+    query = export.sessions_query(await _game_type_id(db, game_type), since, until)
+    return _stream(db, query, format, "game_sessions")
+
+
+@router.get("/leaderboard")
+async def export_leaderboard(game_type: str, sort: str = Query("wins", pattern="^(wins|rating)$"),
+                             format: str = Query("ndjson", pattern=FORMAT_PATTERN), db=Depends(get_read_db)):
+    query = export.leaderboard_query(await _game_type_id(db, game_type), sort)
+    return _stream(db, query, format, f"leaderboard_{game_type}_{sort}", rank=True)
+
+
+# game_type: only users who played it
+@router.get("/users")
+async def export_users(game_type: Optional[str] = None, format: str = Query("ndjson", pattern=FORMAT_PATTERN),
+                       db=Depends(get_read_db)):
+    query = export.users_query(await _game_type_id(db, game_type))
+    return _stream(db, query, format, "users")
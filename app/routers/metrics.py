@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from .. import metrics
+
+router = APIRouter(tags=["metrics"])
+
+# Prometheus scrape endpoint
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return metrics.render()
@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel
 from typing import List, Optional
 
@@ -9,6 +10,13 @@ class UserSync(BaseModel):
 class RoomRequest(BaseModel):
     game_type: str
     telegram_id: int
+    vs_ai: bool = False  # solo game against the server-side AI
+
+
+class MatchmakingRequest(BaseModel):
+    game_type: str
+    telegram_id: int
+    rating: Optional[float] = None
 
 
 class GameResultPlayer(BaseModel):
@@ -24,12 +32,30 @@ class GameReport(BaseModel):
     players: List[GameResultPlayer]
 
 
+class GameReportBatch(BaseModel):
+    reports: List[GameReport]
+
+
 class LeaderboardEntryOut(BaseModel):
     telegram_id: int
     username: str
     wins: int
     losses: int
     draws: int
+    rating: float
+    rank: Optional[int] = None
+
+
+class LeaderboardPageOut(BaseModel):
+    entries: List[LeaderboardEntryOut]
+    next_cursor: Optional[str] = None
+
+
+class LeaderboardRankOut(BaseModel):
+    rank: int
+    total: int
+    entry: LeaderboardEntryOut
+    neighbours: List[LeaderboardEntryOut]
 
 
 class UserStatsOut(BaseModel):
@@ -38,9 +64,32 @@ class UserStatsOut(BaseModel):
     losses: int
     draws: int
     average_score: float
+
+
+class TimeseriesPointOut(BaseModel):
+    bucket: datetime  # bucket start, UTC
+    matches: int
+    sessions: int
+    wins: int
+    losses: int
+    draws: int
+    win_rate: float  # wins per session
+    average_duration_seconds: float  # per match
+
+
+class TimeseriesOut(BaseModel):
+    game_type: str
+    granularity: str
+    points: List[TimeseriesPointOut]
     
     
 class RpsMoveRequest(BaseModel):
     room_code: str
     telegram_id: int
     move: str
+
+
+class GameMoveRequest(BaseModel):
+    room_code: str
+    telegram_id: int
+    move: str
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from .. import metrics, models
+
+# Game types are effectively static; telegram_id -> users.id never changes once created
+GAME_TYPE_CACHE_TTL = float(os.getenv("GAME_TYPE_CACHE_TTL", "3600"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "100000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "600"))
+# room_code -> resolved room (id, game type, engine); short TTL bounds staleness across workers
+ROOM_CACHE_SIZE = int(os.getenv("ROOM_CACHE_SIZE", "100000"))
+ROOM_CACHE_TTL = float(os.getenv("ROOM_CACHE_TTL", "60"))
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU with a per-entry TTL and hit/miss counters. Thread-safe."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+game_type_cache = TTLCache(maxsize=256, ttl=GAME_TYPE_CACHE_TTL)
+user_id_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+room_cache = TTLCache(maxsize=ROOM_CACHE_SIZE, ttl=ROOM_CACHE_TTL)
+
+for _name, _cache in (("game_type", game_type_cache), ("user_id", user_id_cache), ("room", room_cache)):
+    metrics.Counter(f"{_name}_cache_hits_total", f"{_name} cache hits", fn=lambda c=_cache: c.hits)
+    metrics.Counter(f"{_name}_cache_misses_total", f"{_name} cache misses", fn=lambda c=_cache: c.misses)
+    metrics.Gauge(f"{_name}_cache_size", f"{_name} cache entries", fn=lambda c=_cache: len(c))
+
+
+# Only found rows are cached, so a user or game type created later is never hidden by a stale miss
+def get_game_type_id(db: Session, name: str) -> Optional[int]:
+    game_type_id = game_type_cache.get(name, _MISSING)
+    if game_type_id is _MISSING:
+        game_type_id = db.query(models.GameType.id).filter_by(name=name).scalar()
+        if game_type_id is not None:
+            game_type_cache.set(name, game_type_id)
+    return game_type_id
+
+
+def get_user_id(db: Session, telegram_id: int) -> Optional[int]:
+    return get_user_ids(db, [telegram_id]).get(telegram_id)
+
+
+def get_user_ids(db: Session, telegram_ids: Iterable[int]) -> Dict[int, int]:
+    """telegram_id -> users.id for the known users; the misses cost one IN query together."""
+    found, missing = {}, []
+    for telegram_id in telegram_ids:
+        user_id = user_id_cache.get(telegram_id, _MISSING)
+        if user_id is _MISSING:
+            missing.append(telegram_id)
+        else:
+            found[telegram_id] = user_id
+
+    if missing:
+        for telegram_id, user_id in db.query(models.User.telegram_id, models.User.id).filter(
+            models.User.telegram_id.in_(missing)
+        ):
+            user_id_cache.set(telegram_id, user_id)
+            found[telegram_id] = user_id
+    return found
+
+
+def invalidate_game_type(name: str):
+    game_type_cache.invalidate(name)
+
+
+def invalidate_user(telegram_id: int):
+    user_id_cache.invalidate(telegram_id)
+
+
+def cache_stats() -> Dict[str, Dict[str, float]]:
+    return {"game_types": game_type_cache.stats(), "users": user_id_cache.stats(), "rooms": room_cache.stats()}
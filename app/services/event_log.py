@@ -0,0 +1,461 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import shutil
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+
+from .. import metrics, models, schemas
+from ..database import run_in_session
+from .settlement import dialect_insert, record_results, report_results
+
+logger = logging.getLogger("uvicorn")
+
+# Write-behind settlement: results are acknowledged once fsynced to the log and applied to the
+# tables by a background applier. The log is local to the process: the first worker to lock
+# the directory owns it, the others settle directly in the database.
+EVENT_LOG_ENABLED = os.getenv("EVENT_LOG_ENABLED", "false").lower() in ("1", "true", "yes")
+EVENT_LOG_DIR = os.getenv("EVENT_LOG_DIR", "./event_log")
+EVENT_LOG_SEGMENT_BYTES = int(os.getenv("EVENT_LOG_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+# Extra wait (seconds) before each fsync to gather more appends; 0: batch whatever queued during the last fsync
+EVENT_LOG_FSYNC_DELAY = float(os.getenv("EVENT_LOG_FSYNC_DELAY", "0"))
+# Events per applier transaction, and the applier's poll period when it has caught up
+EVENT_LOG_APPLY_BATCH = int(os.getenv("EVENT_LOG_APPLY_BATCH", "500"))
+EVENT_LOG_APPLY_INTERVAL = float(os.getenv("EVENT_LOG_APPLY_INTERVAL", "0.2"))
+# Segments fully behind the applied checkpoint are moved here; empty: they are deleted
+# (replay_event_log --rebuild then needs the log from seq 1, i.e. this archive)
+EVENT_LOG_ARCHIVE_DIR = os.getenv("EVENT_LOG_ARCHIVE_DIR", "")
+
+# Record: seq, payload length, crc32 of the payload, then the JSON payload
+RECORD_HEADER = struct.Struct("<QII")
+SEGMENT_SUFFIX = ".log"
+# Held (flock) by the process writing or replaying the directory
+LOCK_FILE = ".lock"
+
+appends_total = metrics.Counter("event_log_appends_total", "Events appended to the log")
+fsyncs_total = metrics.Counter("event_log_fsyncs_total", "Log fsyncs (appends / fsyncs = group commit size)")
+fsync_seconds = metrics.Histogram(
+    "event_log_fsync_seconds", "Log write + fsync time", buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+applied_total = metrics.Counter("event_log_applied_total", "Events applied to the database")
+segments_retired_total = metrics.Counter(
+    "event_log_segments_retired_total", "Applied segments removed from the log directory", ["action"],
+)
+
+
+class EventLogError(Exception):
+    pass
+
+
+def encode_record(seq: int, event: dict) -> bytes:
+    payload = json.dumps(event, separators=(",", ":")).encode()
+    return RECORD_HEADER.pack(seq, len(payload), zlib.crc32(payload)) + payload
+
+
+def list_segments(*directories: str) -> List[Tuple[int, str]]:
+    """(first seq, path) of every segment in the directories (missing ones are skipped), oldest first."""
+    segments = []
+    for directory in directories:
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            if name.endswith(SEGMENT_SUFFIX):
+                segments.append((int(name[:-len(SEGMENT_SUFFIX)]), os.path.join(directory, name)))
+    return sorted(segments)
+
+
+def scan_segment(f, offset: int = 0) -> Iterator[Tuple[int, dict, int]]:
+    """(seq, event, end offset) of each complete record from offset; stops at a torn or corrupt tail."""
+    f.seek(offset)
+    while True:
+        header = f.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return
+        seq, length, crc = RECORD_HEADER.unpack(header)
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        offset += RECORD_HEADER.size + length
+        yield seq, json.loads(payload), offset
+
+
+def _fsync_dir(directory: str):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def lock_directory(directory: str) -> Optional[int]:
+    """Exclusive, non-blocking lock on the log directory: the lock file's fd, None if another process holds it."""
+    os.makedirs(directory, exist_ok=True)
+    fd = os.open(os.path.join(directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def retire_segments(directory: str, applied_seq: int, archive_dir: str = EVENT_LOG_ARCHIVE_DIR) -> int:
+    """
+    Archive (or delete, without archive_dir) the segments whose next segment starts at or
+    before applied_seq: all their events are in the tables, and the reader has moved past them.
+    The last segment, the one being written, is always kept. Returns how many were retired.
+    """
+    segments = list_segments(directory)
+    retired = 0
+    for (_, path), (next_first_seq, _) in zip(segments, segments[1:]):
+        if next_first_seq > applied_seq:
+            break
+        if archive_dir:
+            os.makedirs(archive_dir, exist_ok=True)
+            shutil.move(path, os.path.join(archive_dir, os.path.basename(path)))
+        else:
+            os.remove(path)
+        retired += 1
+    if retired:
+        if archive_dir:
+            _fsync_dir(archive_dir)
+        _fsync_dir(directory)
+        segments_retired_total.inc(retired, action="archived" if archive_dir else "deleted")
+    return retired
+
+
+class EventLog:
+    """
+    Append-only log of settlement events in segment files, with group commit:
+    append() queues the record and waits until it is fsynced; a single flusher
+    thread writes and fsyncs everything queued since its last fsync in one go.
+    Callers inside AsyncSession.run_sync wait on an asyncio future instead of
+    blocking the event loop.
+    """
+
+    def __init__(self, directory: str = EVENT_LOG_DIR, segment_bytes: int = EVENT_LOG_SEGMENT_BYTES,
+                 fsync_delay: float = EVENT_LOG_FSYNC_DELAY):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync_delay = fsync_delay
+        os.makedirs(directory, exist_ok=True)
+
+        self._cond = threading.Condition()
+        self._pending: List[bytes] = []
+        self._async_waiters: List[Tuple[int, asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._file = None
+        self._recover()
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="event-log-flusher", daemon=True)
+        self._flusher.start()
+
+    @property
+    def durable_seq(self) -> int:
+        return self._durable_seq
+
+    def _recover(self):
+        """Open the last segment for appending, cutting off a record torn by a crash."""
+        segments = list_segments(self.directory)
+        if not segments:
+            self._next_seq = 1
+            self._open_segment(1)
+        else:
+            first_seq, path = segments[-1]
+            self._next_seq, end = first_seq, 0
+            with open(path, "rb") as f:
+                for seq, _, end in scan_segment(f):
+                    self._next_seq = seq + 1
+            if end < os.path.getsize(path):
+                logger.warning(f"Event log: truncating torn tail of {path} at byte {end}")
+                with open(path, "r+b") as f:
+                    f.truncate(end)
+                    os.fsync(f.fileno())
+            self._file = open(path, "ab")
+        self._durable_seq = self._next_seq - 1
+
+    def _open_segment(self, first_seq: int):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(os.path.join(self.directory, f"{first_seq:020d}{SEGMENT_SUFFIX}"), "ab")
+        _fsync_dir(self.directory)
+
+    def append(self, event: dict) -> int:
+        """Append event and return its seq once it is durable."""
+        with self._cond:
+            if self._error is not None or self._closed:
+                raise EventLogError(f"Event log unavailable: {self._error or 'closed'}")
+            seq = self._next_seq
+            self._next_seq += 1
+            # Stamped with the append time (UTC): applied or replayed later, results keep their settle time
+            self._pending.append(encode_record(seq, {**event, "at": datetime.utcnow().isoformat()}))
+            self._cond.notify_all()
+            if in_greenlet():
+                loop = asyncio.get_running_loop()
+                future = loop.create_future()
+                self._async_waiters.append((seq, loop, future))
+            else:
+                future = None
+                while self._durable_seq < seq and self._error is None:
+                    self._cond.wait()
+        if future is not None:
+            await_only(future)
+        if self._durable_seq < seq:
+            raise EventLogError(f"Event log write failed: {self._error}")
+        appends_total.inc()
+        return seq
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+            if self.fsync_delay:
+                time.sleep(self.fsync_delay)
+            with self._cond:
+                batch, self._pending = self._pending, []
+                last_seq = self._next_seq - 1
+
+            started = time.perf_counter()
+            error = None
+            try:
+                self._file.write(b"".join(batch))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                if self._file.tell() >= self.segment_bytes:
+                    self._open_segment(last_seq + 1)
+            except OSError as e:
+                error = e
+                logger.error(f"Event log write failed: {e}")
+            fsync_seconds.observe(time.perf_counter() - started)
+            fsyncs_total.inc()
+
+            with self._cond:
+                if error is None:
+                    self._durable_seq = last_seq
+                else:
+                    self._error = error
+                waiters, self._async_waiters = self._async_waiters, []
+                keep = []
+                for waiter in waiters:
+                    seq, loop, future = waiter
+                    if error is None and seq > last_seq:
+                        keep.append(waiter)
+                    else:
+                        loop.call_soon_threadsafe(_resolve, future)
+                self._async_waiters = keep + self._async_waiters
+                self._cond.notify_all()
+            if error is not None:
+                return
+
+    def close(self):
+        """Flush what is queued and stop the flusher."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._flusher.join()
+        self._file.close()
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class EventLogReader:
+    """
+    Sequential reader of the log from a checkpoint. read() does not move the
+    position: the applier calls advance() once the batch is committed, so a
+    failed transaction is retried with the same events.
+    archive_dir: also read the retired segments kept there (replaying from the start).
+    """
+
+    def __init__(self, directory: str, after_seq: int = 0, archive_dir: Optional[str] = None):
+        self.directory = directory
+        self.directories = (directory, archive_dir) if archive_dir else (directory,)
+        self.applied_seq = after_seq
+        self._position: Optional[Tuple[str, int]] = None  # (segment path, offset) of the next record
+
+    def _start(self, segments: List[Tuple[int, str]]) -> Optional[Tuple[str, int]]:
+        # Last segment starting at or before the next seq, then skip what is already applied
+        candidates = [path for first_seq, path in segments if first_seq <= self.applied_seq + 1]
+        if not candidates and segments:
+            candidates = [segments[0][1]]
+        if not candidates:
+            return None
+        path, offset = candidates[-1], 0
+        with open(path, "rb") as f:
+            for seq, _, end in scan_segment(f):
+                if seq > self.applied_seq:
+                    break
+                offset = end
+        return path, offset
+
+    def read(self, limit: int, upto: Optional[int] = None):
+        """Up to limit (seq, event) after the position, none past seq upto; plus the position after them."""
+        segments = list_segments(*self.directories)
+        position = self._position or self._start(segments)
+        if position is None:
+            return [], None
+        events = []
+        path, offset = position
+        paths = [p for _, p in segments]
+        while len(events) < limit:
+            with open(path, "rb") as f:
+                for seq, event, end in scan_segment(f, offset):
+                    if upto is not None and seq > upto:
+                        return events, (path, offset)
+                    events.append((seq, event))
+                    offset = end
+                    if len(events) >= limit:
+                        break
+                else:
+                    # End of this segment: move on if the writer has rolled to a newer one
+                    i = paths.index(path)
+                    if i + 1 < len(paths):
+                        path, offset = paths[i + 1], 0
+                        continue
+            break
+        return events, (path, offset)
+
+    def advance(self, position: Tuple[str, int], applied_seq: int):
+        self._position = position
+        self.applied_seq = applied_seq
+
+
+def get_checkpoint(db: Session) -> int:
+    return db.execute(select(models.EventLogCheckpoint.applied_seq).where(models.EventLogCheckpoint.id == 1)).scalar() or 0
+
+
+def set_checkpoint(db: Session, applied_seq: int):
+    stmt = dialect_insert(db, models.EventLogCheckpoint).values(id=1, applied_seq=applied_seq)
+    db.execute(stmt.on_conflict_do_update(index_elements=[models.EventLogCheckpoint.id],
+                                          set_={"applied_seq": applied_seq}))
+
+
+def apply_events(db: Session, events: List[Tuple[int, Dict]], rebuild: bool = False,
+                 seen_rooms: Optional[Set[int]] = None) -> int:
+    """
+    Write a batch of log events to the tables in one transaction, together with the checkpoint.
+    "settle" closes its room first: a room settled twice (a duplicate append) is recorded once.
+    rebuild: replaying into emptied tables, rooms are already closed; duplicates are found with seen_rooms.
+    """
+    results = []
+    for seq, event in events:
+        created_at = datetime.fromisoformat(event["at"]) if "at" in event else None
+        if event["type"] == "settle":
+            room_id = event["room_id"]
+            if rebuild:
+                if room_id in seen_rooms:
+                    continue
+                seen_rooms.add(room_id)
+            else:
+                closed = db.execute(
+                    update(models.GameRoom)
+                    .where(models.GameRoom.id == room_id, models.GameRoom.is_active.is_(True))
+                    .values(is_active=False)
+                ).rowcount
+                if not closed:
+                    continue
+            results += [{**r, "room_id": room_id, "match": (seq, 0), "created_at": created_at}
+                        for r in event["results"]]
+        elif event["type"] == "reports":
+            reports = [schemas.GameReport.model_validate(r) for r in event["reports"]]
+            results += [{**r, "match": (seq, r["match"]), "created_at": created_at}
+                        for r in report_results(db, reports)]
+        else:
+            logger.error(f"Event log: skipping unknown event {seq} of type {event['type']!r}")
+    if results:
+        record_results(db, results)
+    set_checkpoint(db, events[-1][0])
+    db.commit()
+    return len(events)
+
+
+# Set by start(): the process' log and the applier's reader (None: this process doesn't own the log)
+log: Optional[EventLog] = None
+reader: Optional[EventLogReader] = None
+_lock_fd: Optional[int] = None
+
+metrics.Gauge("event_log_lag_events", "Durable events not yet applied to the database",
+              fn=lambda: log.durable_seq - reader.applied_seq if log is not None and reader is not None else 0)
+
+
+async def apply_pending(limit: int = EVENT_LOG_APPLY_BATCH) -> int:
+    """Apply the next batch of durable events; returns how many were applied (0: caught up)."""
+    events, position = await asyncio.to_thread(reader.read, limit, log.durable_seq if log is not None else None)
+    if not events:
+        return 0
+    await run_in_session(apply_events, events)
+    previous = reader._position
+    reader.advance(position, events[-1][0])
+    applied_total.inc(len(events))
+    if previous is None or previous[0] != position[0]:
+        # The reader moved to another segment: the ones behind the checkpoint can go
+        try:
+            await asyncio.to_thread(retire_segments, reader.directory, reader.applied_seq)
+        except OSError as e:
+            logger.error(f"Event log: retiring applied segments failed: {e}")
+    return len(events)
+
+
+async def catch_up():
+    """Replay every durable event past the checkpoint, e.g. after a crash, before serving."""
+    applied = 0
+    while True:
+        n = await apply_pending()
+        if not n:
+            return applied
+        applied += n
+
+
+async def run_applier(interval: float = EVENT_LOG_APPLY_INTERVAL):
+    """Background loop started with the app; cancel the task to stop it."""
+    while True:
+        try:
+            if await apply_pending():
+                continue
+        except Exception as e:
+            logger.error(f"Event log applier failed: {e}")
+        await asyncio.sleep(interval)
+
+
+async def start(directory: str = EVENT_LOG_DIR) -> int:
+    """
+    Lock and open the log, replay what the tables are missing; returns the number of events replayed.
+    If another process (e.g. another uvicorn worker) holds the directory, the log stays off here.
+    """
+    global log, reader, _lock_fd
+    _lock_fd = lock_directory(directory)
+    if _lock_fd is None:
+        logger.warning(f"Event log: {directory} is locked by another process, settling directly on this worker")
+        return 0
+    log = await asyncio.to_thread(EventLog, directory)
+    reader = EventLogReader(directory, await run_in_session(get_checkpoint))
+    replayed = await catch_up()
+    if replayed:
+        logger.info(f"Event log: replayed {replayed} events up to seq {reader.applied_seq}")
+    return replayed
+
+
+async def stop():
+    """Drain the log into the tables and close it."""
+    global log, _lock_fd
+    await asyncio.to_thread(log.close)
+    await catch_up()
+    log = None
+    os.close(_lock_fd)
+    _lock_fd = None
@@ -0,0 +1,149 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from .. import models
+from .stats import RANKINGS, _naive_utc
+
+# Rows fetched per round trip; memory stays at one chunk whatever the table size
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+# --- Queries: plain column selects (no ORM objects, nothing kept in the identity map) ---
+
+def sessions_query(game_type_id: Optional[int] = None, since: Optional[datetime] = None,
+                   until: Optional[datetime] = None):
+    """Game sessions in id order; since/until bound their settle time (created_at)."""
+    since, until = _naive_utc(since), _naive_utc(until)
+    query = (
+        select(
+            models.GameSession.id,
+            models.GameRoom.code.label("room_code"),
+            models.GameType.name.label("game_type"),
+            models.User.telegram_id,
+            models.GameSession.result,
+            models.GameSession.score,
+            models.GameSession.duration_seconds,
+            models.GameSession.created_at,
+        )
+        .join(models.GameRoom, models.GameSession.room_id == models.GameRoom.id)
+        .join(models.GameType, models.GameRoom.game_type_id == models.GameType.id)
+        .join(models.User, models.GameSession.user_id == models.User.id)
+        .order_by(models.GameSession.id)
+    )
+    if game_type_id is not None:
+        query = query.where(models.GameRoom.game_type_id == game_type_id)
+    if since is not None:
+        query = query.where(models.GameSession.created_at >= since)
+    if until is not None:
+        query = query.where(models.GameSession.created_at < until)
+    return query
+
+
+def leaderboard_query(game_type_id: int, sort: str = "wins"):
+    """One game type's leaderboard in ranking order (the same order as /api/leaderboard)."""
+    return (
+        select(
+            models.User.telegram_id,
+            models.User.username,
+            models.LeaderboardEntry.wins,
+            models.LeaderboardEntry.losses,
+            models.LeaderboardEntry.draws,
+            models.LeaderboardEntry.rating,
+        )
+        .join(models.User, models.LeaderboardEntry.user_id == models.User.id)
+        .where(models.LeaderboardEntry.game_type_id == game_type_id)
+        .order_by(RANKINGS[sort].desc(), models.LeaderboardEntry.user_id.asc())
+    )
+
+
+def users_query(game_type_id: Optional[int] = None):
+    """Users in id order; with a game type, only those on its leaderboard (i.e. who played it)."""
+    query = select(models.User.id, models.User.telegram_id, models.User.username).order_by(models.User.id)
+    if game_type_id is not None:
+        query = query.where(exists().where(
+            models.LeaderboardEntry.user_id == models.User.id,
+            models.LeaderboardEntry.game_type_id == game_type_id,
+        ))
+    return query
+
+
+# --- Encoding: one text chunk per fetched chunk of rows ---
+
+def _jsonable(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class Encoder:
+    """Turns chunks of rows into NDJSON or CSV text; the CSV header goes out with the first chunk."""
+
+    def __init__(self, fmt: str, columns: Iterable[str], rank: bool = False):
+        self.fmt = fmt
+        # rank: prepend the row's 1-based position (leaderboards)
+        self.columns = (["rank"] if rank else []) + list(columns)
+        self.rank = 0 if rank else None
+        self.header_sent = False
+
+    def encode(self, rows) -> str:
+        if self.rank is not None:
+            rows = [(self.rank + i + 1, *row) for i, row in enumerate(rows)]
+            self.rank += len(rows)
+        if self.fmt == "ndjson":
+            return "".join(
+                json.dumps(dict(zip(self.columns, map(_jsonable, row))), separators=(",", ":")) + "\n"
+                for row in rows
+            )
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator="\n")
+        if not self.header_sent:
+            writer.writerow(self.columns)
+            self.header_sent = True
+        writer.writerows(tuple(map(_jsonable, row)) for row in rows)
+        return out.getvalue()
+
+    def finish(self) -> str:
+        # An empty CSV export still has its header
+        if self.fmt == "csv" and not self.header_sent:
+            return self.encode([])
+        return ""
+
+
+def iter_export(db: Session, query, fmt: str, rank: bool = False,
+                chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """Sync export (CLI): yield_per streams the result through a server-side cursor, chunk by chunk."""
+    result = db.execute(query.execution_options(yield_per=chunk_size))
+    encoder = Encoder(fmt, result.keys(), rank)
+    for rows in result.partitions():
+        yield encoder.encode(rows)
+    yield encoder.finish()
+
+
+async def stream_export(db, query, fmt: str, rank: bool = False, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Async export for StreamingResponse: the first chunk is sent as soon as it is
+    fetched. AsyncSession streams natively; a sync Session fetches each chunk
+    in the threadpool so the event loop never waits on the cursor.
+    """
+    query = query.execution_options(yield_per=chunk_size)
+    if isinstance(db, AsyncSession):
+        result = await db.stream(query)
+        encoder = Encoder(fmt, result.keys(), rank)
+        async for rows in result.partitions():
+            yield encoder.encode(rows)
+    else:
+        result = await run_in_threadpool(db.execute, query)
+        encoder = Encoder(fmt, result.keys(), rank)
+        partitions = result.partitions()
+        while rows := await run_in_threadpool(next, partitions, None):
+            yield encoder.encode(rows)
+    yield encoder.finish()
@@ -0,0 +1,330 @@
+import logging
+import os
+from datetime import datetime
+from typing import NamedTuple
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .. import models
+from ..game_engines import ENGINES, GameEngine, get_engine
+from ..schemas import GameMoveRequest, RpsMoveRequest, RoomRequest
+from . import cache, event_log, room_events
+from .room_codes import room_code_allocator
+from .room_store import room_store
+from .settlement import record_results
+
+# Logging
+logger = logging.getLogger("uvicorn")
+
+# Reserved player for the server-side AI in solo rooms (gets a users row like anyone else).
+# Its results are recorded unranked: kept as history, off the leaderboard and out of the Elo ratings
+AI_TELEGRAM_ID = int(os.getenv("AI_TELEGRAM_ID", "0"))
+AI_USERNAME = os.getenv("AI_USERNAME", "bot")
+
+# Moves only write the room store: game_rooms.updated_at (what the sweeper's idle timeout reads)
+# is bumped on a move at most once per this many seconds per room
+ROOM_TOUCH_INTERVAL = float(os.getenv("ROOM_TOUCH_INTERVAL", "60"))
+_touched_rooms = cache.TTLCache(maxsize=cache.ROOM_CACHE_SIZE, ttl=ROOM_TOUCH_INTERVAL)
+
+
+# Add RPS game type (once)
+def add_rps_game_type(db: Session):
+    if db.query(models.GameType).filter_by(name="rps").first():
+        return {"message": "'rps' game type already exists."}
+    db.add(models.GameType(name="rps"))
+    db.commit()
+    cache.invalidate_game_type("rps")
+    return {"message": "'rps' game type added successfully"}
+
+
+# Add a game type for every registered engine (once)
+def add_game_types(db: Session):
+    existing = {name for (name,) in db.query(models.GameType.name)}
+    added = [name for name in ENGINES if name not in existing]
+    db.add_all(models.GameType(name=name) for name in added)
+    db.commit()
+    for name in added:
+        cache.invalidate_game_type(name)
+    return {"added": added, "existing": sorted(existing)}
+
+
+# Room creation
+def create_game_room(db: Session, data: RoomRequest):
+    # Unique room code: drawn from the allocator, no lookups in game_rooms.
+    # Taken before this session checks out a connection: a block refill commits on a second one, and
+    # requests each holding a connection while waiting for another can drain the pool.
+    # A rejected request just skips its code. (Inactive rooms are cleaned up by the sweeper, see services/sweeper.py)
+    room_code = room_code_allocator.next_code(db)
+
+    game_type_id = cache.get_game_type_id(db, data.game_type)
+    if not game_type_id:
+        return {"error": "Invalid game type"}
+
+    if not cache.get_user_id(db, data.telegram_id):
+        return {"error": "User not found"}
+
+    engine = get_engine(data.game_type)
+    if data.vs_ai and (engine is None or not engine.has_ai):
+        return {"error": f"No AI opponent for '{data.game_type}'"}
+
+    room = models.GameRoom(code=room_code, game_type_id=game_type_id, is_active=True)
+    db.add(room)
+    if data.vs_ai and not cache.get_user_id(db, AI_TELEGRAM_ID):
+        db.add(models.User(telegram_id=AI_TELEGRAM_ID, username=AI_USERNAME))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Only possible against a legacy random code from before the allocator
+        db.rollback()
+        logger.warning(f"Room code {room_code} already taken, allocating another one")
+        room = models.GameRoom(code=room_code_allocator.next_code(db), game_type_id=game_type_id, is_active=True)
+        db.add(room)
+        db.commit()
+
+    if data.vs_ai:
+        room_store.update(room.code, lambda state: {
+            **engine.ai_seat(state, data.telegram_id, AI_TELEGRAM_ID), "ai": str(AI_TELEGRAM_ID)
+        })
+    return {"room_code": room.code}
+
+
+class RoomContext(NamedTuple):
+    room_id: int
+    game_type_id: int
+    game_type: str
+    engine: GameEngine
+
+
+# Resolve a room once: id, game type and engine are cached per room code
+def resolve_room(db: Session, room_code: str) -> RoomContext:
+    context = cache.room_cache.get(room_code)
+    if context is not None:
+        return context
+
+    room = (
+        db.query(models.GameRoom.id, models.GameRoom.is_active, models.GameRoom.game_type_id, models.GameType.name)
+        .join(models.GameType, models.GameRoom.game_type_id == models.GameType.id)
+        .filter(models.GameRoom.code == room_code)
+        .first()
+    )
+    if not room:
+        logger.error(f"Room {room_code} not found")
+        raise HTTPException(status_code=404, detail="Room not found")
+
+    if not room.is_active:
+        logger.error(f"Room {room_code} is not active")
+        raise HTTPException(status_code=400, detail="Room is not active")
+
+    engine = get_engine(room.name)
+    if engine is None:
+        raise HTTPException(status_code=400, detail=f"No engine for game type '{room.name}'")
+
+    context = RoomContext(room.id, room.game_type_id, room.name, engine)
+    cache.room_cache.set(room_code, context)
+    return context
+
+
+def _room_for(db: Session, game_type: str, room_code: str) -> RoomContext:
+    context = resolve_room(db, room_code)
+    if context.game_type != game_type:
+        raise HTTPException(status_code=400, detail=f"Room {room_code} is a '{context.game_type}' room")
+    return context
+
+
+def _touch_room(db: Session, room_id: int, room_code: str):
+    # A room being played is not idle: keep the sweeper off it
+    if _touched_rooms.get(room_code) is not None:
+        return
+    db.execute(
+        update(models.GameRoom)
+        .where(models.GameRoom.id == room_id, models.GameRoom.is_active.is_(True))
+        .values(updated_at=datetime.utcnow())
+    )
+    db.commit()
+    _touched_rooms.set(room_code, True)
+
+
+# Register a move for any game type
+def play_move(db: Session, game_type: str, data: GameMoveRequest):
+    context = _room_for(db, game_type, data.room_code)
+    engine = context.engine
+
+    def apply(state):
+        if room_events.RESULT_FIELD in state:
+            raise HTTPException(status_code=400, detail="Room is not active")
+        if engine.is_terminal(state):
+            raise HTTPException(status_code=400, detail="Game is over, settle the room")
+        if state.get("ai") == str(data.telegram_id):
+            raise HTTPException(status_code=400, detail="Reserved player id")
+        error = engine.validate_move(state, data.telegram_id, data.move)
+        if error:
+            raise HTTPException(status_code=400, detail=error)
+        state = engine.apply_move(state, data.telegram_id, data.move)
+
+        # Solo room: the AI answers within the same update (a table lookup)
+        if "ai" in state and not engine.is_terminal(state):
+            state = engine.apply_move(state, int(state["ai"]), engine.ai_move(state))
+        return state
+
+    state = room_store.update(data.room_code, apply)
+    summary = engine.summary(state)
+    if not engine.is_terminal(state):
+        _touch_room(db, context.room_id, data.room_code)
+        room_events.broker.publish(data.room_code, {"type": "move", "room_code": data.room_code, "state": summary})
+        return {"status": "Move registered", "terminal": False, "state": summary}
+
+    # Last move: settle right away, subscribers get the result pushed
+    try:
+        result = settle_room(db, game_type, data.room_code)
+    except HTTPException as e:
+        logger.error(f"Auto-settle of room {data.room_code} failed: {e.detail}")
+        result = None
+    return {"status": "Game over", "terminal": True, "state": summary, "result": result}
+
+
+def _settled(game_type: str, room_code: str):
+    result = room_events.stored_result(room_code)
+    if result and result["game_type"] != game_type:
+        raise HTTPException(status_code=400, detail=f"Room {room_code} is a '{result['game_type']}' room")
+    return result
+
+
+# Settle a finished room: record results, close the room, drop its state.
+# Rooms are settled by their last move; calling this again returns the stored result.
+def settle_room(db: Session, game_type: str, room_code: str):
+    result = _settled(game_type, room_code)
+    if result:
+        return result
+
+    context = _room_for(db, game_type, room_code)
+    engine = context.engine
+
+    state = room_store.get(room_code)
+    if not engine.is_terminal(state):
+        logger.error(f"Room {room_code} is not finished. State: {state}")
+        raise HTTPException(status_code=400, detail="Not enough moves")
+
+    outcome = engine.outcome(state)
+
+    # Resolve all players (cached, misses share one query)
+    user_ids = cache.get_user_ids(db, outcome)
+    missing = [p for p in outcome if p not in user_ids]
+    if missing:
+        logger.error(f"Players {missing} not found in DB")
+        raise HTTPException(status_code=404, detail="One or both players not found in DB")
+
+    results = [
+        {"user_id": user_ids[player], "game_type_id": context.game_type_id, "room_id": context.room_id,
+         "result": result, "score": engine.score(result), "ranked": player != AI_TELEGRAM_ID}
+        for player, result in outcome.items()
+    ]
+
+    if event_log.log is not None:
+        # Write-behind: acknowledged once durable in the log; the applier closes the room and records
+        # the results (a duplicate settle is dropped there), so rating changes aren't known yet
+        try:
+            event_log.log.append({"type": "settle", "room_id": context.room_id, "results": results})
+        except event_log.EventLogError as e:
+            logger.error(f"Event log append failed: {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+        rating_changes = {}
+    else:
+        try:
+            # Close the room only if still active: a concurrent settle of the same room loses here
+            closed = db.execute(
+                update(models.GameRoom)
+                .where(models.GameRoom.id == context.room_id, models.GameRoom.is_active.is_(True))
+                .values(is_active=False)
+            ).rowcount
+            if not closed:
+                db.rollback()
+                cache.room_cache.invalidate(room_code)
+                result = _settled(game_type, room_code)
+                if result:
+                    return result
+                raise HTTPException(status_code=400, detail="Room is not active")
+
+            # Save game sessions, bump the leaderboard counters with one upsert, update the ratings
+            rating_changes = record_results(db, results)
+            db.commit()
+        except HTTPException:
+            raise
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Database commit failed: {e}")
+            raise HTTPException(status_code=500, detail=f"Database error: {e}")
+
+    result = {
+        "type": "result",
+        "message": "Game session ended",
+        "room_code": room_code,
+        "game_type": game_type,
+        "outcome": {str(player): outcome for player, outcome in outcome.items()},
+        "rating_change": {
+            str(player): round(rating_changes[(user_ids[player], context.game_type_id)], 1)
+            for player in outcome if (user_ids[player], context.game_type_id) in rating_changes
+        },
+        "state": engine.summary(state),
+    }
+
+    # Swap the temporary state for the result, then push it to the subscribers
+    room_events.store_result(room_code, result)
+    cache.room_cache.invalidate(room_code)
+    room_events.broker.publish(room_code, result)
+    return result
+
+
+# Final event of a room that is already settled, None if the room is still being played
+def open_room_events(db: Session, room_code: str):
+    result = room_events.stored_result(room_code)
+    if result:
+        return result
+    try:
+        resolve_room(db, room_code)
+    except HTTPException:
+        # Settled between the two reads
+        result = room_events.stored_result(room_code)
+        if result:
+            return result
+        raise
+    return None
+
+
+# Register RPS move (legacy endpoint, same flow as /game/rps/move)
+def play_rps_move(db: Session, data: RpsMoveRequest):
+    result = play_move(db, "rps", GameMoveRequest(**data.model_dump()))
+    if not result["terminal"]:
+        return {"status": "Move registered, waiting for opponent"}
+
+    players = [p for p, _ in result["state"]["moves"]]
+    if result["result"] is None:
+        return {"status": "Ready to end session", "players": players}
+    return {"status": "Game session ended", "players": players, "result": _rps_legacy_result(result["result"])}
+
+
+def _rps_legacy_result(settled: dict):
+    (player1_id, move1), (player2_id, move2) = settled["state"]["moves"]
+    outcome = settled["outcome"][str(player1_id)]
+    if outcome == "draw":
+        winner = "draw"
+    else:
+        winner = "p1" if outcome == "win" else "p2"
+
+    return {
+        "message": "Game session ended",
+        "player_1": player1_id,
+        "move_1": move1,
+        "player_2": player2_id,
+        "move_2": move2,
+        "result": {"result": winner}
+    }
+
+
+# End RPS session (legacy endpoint: errors are returned in the body, as the bot expects).
+# The room is settled by its last move, so this returns the stored result.
+def end_rps_session(db: Session, room_code: str):
+    try:
+        return _rps_legacy_result(settle_room(db, "rps", room_code))
+    except HTTPException as e:
+        return {"error": e.detail}
@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from .. import metrics, models
+from ..database import run_in_session
+from ..game_engines import get_engine
+from ..schemas import MatchmakingRequest
+from . import cache
+from .room_codes import room_code_allocator
+from .room_store import room_store
+
+logger = logging.getLogger("uvicorn")
+
+# The queue lives in this process: off by default, since with several workers each would hold a
+# separate queue. Enable it on a single-worker deployment (or one that routes players to one worker)
+MATCHMAKING_ENABLED = os.getenv("MATCHMAKING_ENABLED", "false").lower() in ("1", "true", "yes")
+MATCHMAKING_TICK = float(os.getenv("MATCHMAKING_TICK", "0.5"))
+# Most pairs formed per tick, i.e. GameRoom rows inserted per commit
+MATCHMAKING_BATCH = int(os.getenv("MATCHMAKING_BATCH", "500"))
+# Rating of players with no leaderboard row yet (and no rating in the request)
+MATCHMAKING_DEFAULT_RATING = float(os.getenv("MATCHMAKING_DEFAULT_RATING", "1500"))
+# Rating window: starts at BASE, grows by WIDEN per second waited, capped at MAX
+MATCHMAKING_BUCKET_WIDTH = float(os.getenv("MATCHMAKING_BUCKET_WIDTH", "50"))
+MATCHMAKING_BASE_WINDOW = float(os.getenv("MATCHMAKING_BASE_WINDOW", "50"))
+MATCHMAKING_WIDEN_RATE = float(os.getenv("MATCHMAKING_WIDEN_RATE", "25"))
+MATCHMAKING_MAX_WINDOW = float(os.getenv("MATCHMAKING_MAX_WINDOW", "400"))
+# Oldest tickets looked at per bucket when searching an opponent: a lookup costs at most
+# this many tickets per bucket in the window, whatever the queue size
+MATCHMAKING_BUCKET_SCAN = int(os.getenv("MATCHMAKING_BUCKET_SCAN", "8"))
+# How long a match stays readable from the status endpoint
+MATCHMAKING_RESULT_TTL = float(os.getenv("MATCHMAKING_RESULT_TTL", "300"))
+
+match_latency = metrics.Histogram(
+    "matchmaking_wait_seconds", "Enqueue to room creation", ["game_type"],
+    buckets=(0.5, 1, 2, 5, 10, 15, 30, 60, 120, 300),
+)
+matches_total = metrics.Counter("matchmaking_matches_total", "Pairs matched", ["game_type"])
+
+
+class Ticket(NamedTuple):
+    telegram_id: int
+    rating: float
+    enqueued_at: float
+    bucket: int
+
+
+class MatchmakingQueue:
+    """
+    Waiting players of one game type, bucketed by rating.
+    Buckets and the global queue are insertion-ordered dicts (oldest first, O(1) removal);
+    the sorted list of non-empty bucket keys is kept with bisect, so finding the buckets
+    inside a rating window is O(log n).
+    """
+
+    def __init__(self, bucket_width: float = MATCHMAKING_BUCKET_WIDTH, base_window: float = MATCHMAKING_BASE_WINDOW,
+                 widen_rate: float = MATCHMAKING_WIDEN_RATE, max_window: float = MATCHMAKING_MAX_WINDOW,
+                 bucket_scan: int = MATCHMAKING_BUCKET_SCAN):
+        self.bucket_width = bucket_width
+        self.base_window = base_window
+        self.widen_rate = widen_rate
+        self.max_window = max_window
+        self.bucket_scan = bucket_scan
+        self._tickets: Dict[int, Ticket] = {}
+        self._buckets: Dict[int, Dict[int, Ticket]] = {}
+        self._keys: List[int] = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tickets)
+
+    def __contains__(self, telegram_id: int):
+        return telegram_id in self._tickets
+
+    def window(self, ticket: Ticket, now: float) -> float:
+        return min(self.base_window + self.widen_rate * (now - ticket.enqueued_at), self.max_window)
+
+    def get(self, telegram_id: int) -> Optional[Ticket]:
+        return self._tickets.get(telegram_id)
+
+    def add(self, telegram_id: int, rating: float, now: Optional[float] = None) -> Ticket:
+        """Queue a player; a player already queued keeps their place."""
+        with self._lock:
+            ticket = self._tickets.get(telegram_id)
+            if ticket is not None:
+                return ticket
+            ticket = Ticket(telegram_id, rating, time.monotonic() if now is None else now,
+                            int(rating // self.bucket_width))
+            self._tickets[telegram_id] = ticket
+            bucket = self._buckets.get(ticket.bucket)
+            if bucket is None:
+                bucket = self._buckets[ticket.bucket] = {}
+                insort(self._keys, ticket.bucket)
+            bucket[telegram_id] = ticket
+            return ticket
+
+    def remove(self, telegram_id: int) -> Optional[Ticket]:
+        with self._lock:
+            return self._remove(telegram_id)
+
+    def _remove(self, telegram_id: int) -> Optional[Ticket]:
+        ticket = self._tickets.pop(telegram_id, None)
+        if ticket is None:
+            return None
+        bucket = self._buckets[ticket.bucket]
+        del bucket[telegram_id]
+        if not bucket:
+            del self._buckets[ticket.bucket]
+            del self._keys[bisect_left(self._keys, ticket.bucket)]
+        return ticket
+
+    def _opponent(self, ticket: Ticket, now: float) -> Optional[Ticket]:
+        """Closest bucket first, oldest player first inside it (only the oldest bucket_scan of each bucket)."""
+        window = self.window(ticket, now)
+        lo = bisect_left(self._keys, int((ticket.rating - window) // self.bucket_width))
+        hi = bisect_right(self._keys, int((ticket.rating + window) // self.bucket_width))
+        candidates = sorted(self._keys[lo:hi], key=lambda key: abs(key - ticket.bucket))
+        for key in candidates:
+            for other in islice(self._buckets[key].values(), self.bucket_scan):
+                if other.telegram_id != ticket.telegram_id and abs(other.rating - ticket.rating) <= window:
+                    return other
+        return None
+
+    def pair(self, now: Optional[float] = None, limit: int = MATCHMAKING_BATCH) -> List[Tuple[Ticket, Ticket]]:
+        """
+        Match players, longest waiting first, each within their own rating window.
+        The lock is taken per candidate, not for the whole pass: enqueue and cancel
+        are never held up by a long queue.
+        """
+        now = time.monotonic() if now is None else now
+        pairs = []
+        with self._lock:
+            waiting = list(self._tickets)
+        for telegram_id in waiting:
+            if len(pairs) >= limit:
+                break
+            with self._lock:
+                ticket = self._tickets.get(telegram_id)
+                if ticket is None:
+                    continue  # matched earlier in this pass, or cancelled
+                opponent = self._opponent(ticket, now)
+                if opponent is not None:
+                    self._remove(ticket.telegram_id)
+                    self._remove(opponent.telegram_id)
+                    pairs.append((ticket, opponent))
+        return pairs
+
+
+class Matchmaker:
+    """Queues per game type plus the recent matches, read by the status endpoint."""
+
+    def __init__(self):
+        self.queues: Dict[str, MatchmakingQueue] = {}
+        self.matches = cache.TTLCache(maxsize=cache.USER_CACHE_SIZE, ttl=MATCHMAKING_RESULT_TTL)
+        self._lock = threading.Lock()
+
+    def queue(self, game_type: str) -> MatchmakingQueue:
+        with self._lock:
+            queue = self.queues.get(game_type)
+            if queue is None:
+                queue = self.queues[game_type] = MatchmakingQueue()
+            return queue
+
+    def queued(self) -> int:
+        return sum(len(queue) for queue in list(self.queues.values()))
+
+
+matchmaker = Matchmaker()
+
+metrics.Gauge("matchmaking_queued_players", "Players waiting for a match", fn=matchmaker.queued)
+
+
+def enqueue(db: Session, data: MatchmakingRequest):
+    if not MATCHMAKING_ENABLED:
+        raise HTTPException(status_code=503, detail="Matchmaking is disabled")
+    if not cache.get_game_type_id(db, data.game_type):
+        raise HTTPException(status_code=400, detail="Invalid game type")
+    if not cache.get_user_id(db, data.telegram_id):
+        raise HTTPException(status_code=404, detail="User not found")
+
+    for game_type, queue in list(matchmaker.queues.items()):
+        if game_type != data.game_type and data.telegram_id in queue:
+            raise HTTPException(status_code=400, detail=f"Already queued for '{game_type}'")
+
+    matchmaker.matches.invalidate(data.telegram_id)
+    rating = data.rating
+    if rating is None:
+        rating = db.query(models.LeaderboardEntry.rating).filter_by(
+            user_id=cache.get_user_id(db, data.telegram_id), game_type_id=cache.get_game_type_id(db, data.game_type)
+        ).scalar()
+    if rating is None:
+        rating = MATCHMAKING_DEFAULT_RATING
+    matchmaker.queue(data.game_type).add(data.telegram_id, rating)
+    return status(data.telegram_id)
+
+
+def cancel(telegram_id: int):
+    removed = [game_type for game_type, queue in list(matchmaker.queues.items()) if queue.remove(telegram_id)]
+    return {"status": "cancelled" if removed else "not queued"}
+
+
+def status(telegram_id: int):
+    match = matchmaker.matches.get(telegram_id)
+    if match is not None:
+        return {"status": "matched", **match}
+
+    now = time.monotonic()
+    for game_type, queue in list(matchmaker.queues.items()):
+        ticket = queue.get(telegram_id)
+        if ticket is not None:
+            return {
+                "status": "queued",
+                "game_type": game_type,
+                "rating": ticket.rating,
+                "waited_seconds": round(now - ticket.enqueued_at, 1),
+                "window": round(queue.window(ticket, now), 1),
+                "queued_players": len(queue),
+            }
+    return {"status": "not queued"}
+
+
+def create_match_rooms(db: Session, game_type: str, pairs: List[Tuple[Ticket, Ticket]]) -> List[str]:
+    """One GameRoom per pair, inserted with a single commit; the engine seats the pair, so the room is theirs."""
+    # Codes first, before this session checks out a connection: the allocator commits on its own one
+    codes = [room_code_allocator.next_code(db) for _ in pairs]
+    game_type_id = cache.get_game_type_id(db, game_type)
+    engine = get_engine(game_type)
+    db.add_all(models.GameRoom(code=code, game_type_id=game_type_id, is_active=True) for code in codes)
+    db.commit()
+
+    for code, (a, b) in zip(codes, pairs):
+        if engine is not None:
+            room_store.update(code, lambda state, a=a, b=b: engine.seat_players(state, [a.telegram_id, b.telegram_id]))
+    return codes
+
+
+async def match_once(now: Optional[float] = None) -> int:
+    matched = 0
+    for game_type, queue in list(matchmaker.queues.items()):
+        # A pass over a long queue is pure Python: keep it off the event loop (the queue has its own lock)
+        pairs = await asyncio.to_thread(queue.pair, now)
+        if not pairs:
+            continue
+        try:
+            codes = await run_in_session(create_match_rooms, game_type, pairs)
+        except Exception as e:
+            logger.error(f"Matchmaking room creation failed, requeueing {len(pairs)} pairs: {e}")
+            for a, b in pairs:
+                for ticket in (a, b):
+                    queue.add(ticket.telegram_id, ticket.rating, ticket.enqueued_at)
+            continue
+
+        done = time.monotonic()
+        for code, (a, b) in zip(codes, pairs):
+            for player, opponent in ((a, b), (b, a)):
+                matchmaker.matches.set(player.telegram_id, {
+                    "game_type": game_type, "room_code": code, "opponent": opponent.telegram_id,
+                })
+                match_latency.observe(done - player.enqueued_at, game_type=game_type)
+        matches_total.inc(len(pairs), game_type=game_type)
+        matched += len(pairs)
+    return matched
+
+
+async def run_matchmaker(interval: float = MATCHMAKING_TICK):
+    """Background loop started with the app; cancel the task to stop it."""
+    while True:
+        try:
+            await match_once()
+        except Exception as e:
+            logger.error(f"Matchmaker failed: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,91 @@
+import os
+from typing import Dict, List, Sequence, Tuple
+
+from sqlalchemy import bindparam, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from .. import models
+
+# Elo: new leaderboard rows start at the column default, K sets how far one match moves a rating
+RATING_INITIAL = 1500.0
+RATING_K = float(os.getenv("RATING_K", "32"))
+
+# Score of a 1v1 match from the first player's result
+RESULT_SCORE = {"win": 1.0, "draw": 0.5, "loss": 0.0}
+
+# Key of a rating: (user_id, game_type_id)
+RatingKey = Tuple[int, int]
+
+# Keys per (user_id, game_type_id) IN (...) read, under SQLite's bound-parameter limit
+READ_CHUNK = 250
+
+
+def expected(rating: float, opponent: float) -> float:
+    return 1.0 / (1.0 + 10.0 ** ((opponent - rating) / 400.0))
+
+
+def rated_matches(results: List[Dict]) -> List[Tuple[RatingKey, RatingKey, float]]:
+    """
+    (player a, player b, score of a) for every 1v1 match in results, in order.
+    Results are grouped into matches by their "match" key (room_id if absent);
+    matches without exactly two players or with an unknown result are not rated.
+    Unranked results (ranked false) are left out, so a solo match against the AI is not rated.
+    """
+    groups: Dict = {}
+    for r in results:
+        if not r.get("ranked", True):
+            continue
+        groups.setdefault(r.get("match", r.get("room_id")), []).append(r)
+
+    matches = []
+    for group in groups.values():
+        if len(group) != 2 or group[0]["result"] not in RESULT_SCORE:
+            continue
+        a, b = group
+        matches.append((
+            (a["user_id"], a["game_type_id"]), (b["user_id"], b["game_type_id"]), RESULT_SCORE[a["result"]],
+        ))
+    return matches
+
+
+def apply_elo(ratings: Dict[RatingKey, float], matches: Sequence[Tuple[RatingKey, RatingKey, float]],
+              k: float = RATING_K) -> Dict[RatingKey, float]:
+    """Play matches in order on ratings (updated in place); missing players start at RATING_INITIAL."""
+    for a, b, score in matches:
+        ra = ratings.get(a, RATING_INITIAL)
+        rb = ratings.get(b, RATING_INITIAL)
+        delta = k * (score - expected(ra, rb))
+        ratings[a] = ra + delta
+        ratings[b] = rb - delta
+    return ratings
+
+
+def update_ratings(db: Session, results: List[Dict]):
+    """
+    Incremental Elo for the 1v1 matches in results: one read of the current
+    ratings and one executemany UPDATE. Runs after the leaderboard upsert,
+    so every row exists and is already locked by this transaction.
+    """
+    matches = rated_matches(results)
+    if not matches:
+        return {}
+    keys = sorted({key for a, b, _ in matches for key in (a, b)})
+
+    entry = models.LeaderboardEntry
+    current = {}
+    for i in range(0, len(keys), READ_CHUNK):
+        rows = db.execute(
+            select(entry.user_id, entry.game_type_id, entry.rating)
+            .where(tuple_(entry.user_id, entry.game_type_id).in_(keys[i:i + READ_CHUNK]))
+        )
+        current.update(((user_id, game_type_id), rating) for user_id, game_type_id, rating in rows)
+    ratings = apply_elo(dict(current), matches)
+
+    db.execute(
+        update(entry.__table__)
+        .where(entry.__table__.c.user_id == bindparam("b_user_id"),
+               entry.__table__.c.game_type_id == bindparam("b_game_type_id"))
+        .values(rating=bindparam("b_rating")),
+        [{"b_user_id": u, "b_game_type_id": g, "b_rating": ratings[(u, g)]} for u, g in keys],
+    )
+    return {key: ratings[key] - current.get(key, RATING_INITIAL) for key in keys}
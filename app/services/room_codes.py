@@ -0,0 +1,127 @@
+import hashlib
+import os
+import secrets
+import string
+import threading
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from .. import models
+from .settlement import dialect_insert
+
+ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 6
+CODE_SPACE = len(ALPHABET) ** CODE_LENGTH  # 36^6 ~ 2.18e9 codes
+
+# Counters reserved per database round-trip
+ROOM_CODE_BLOCK_SIZE = int(os.getenv("ROOM_CODE_BLOCK_SIZE", "1000"))
+
+
+def new_key() -> str:
+    return secrets.token_hex(16)
+
+
+def round_keys(key: str) -> List[int]:
+    return [
+        int.from_bytes(hashlib.blake2b(f"{key}:{i}".encode(), digest_size=4).digest(), "big")
+        for i in range(4)
+    ]
+
+
+def _round(half: int, key: int) -> int:
+    x = ((half ^ key) * 0x45D9F3B) & 0xFFFFFFFF
+    x ^= x >> 16
+    return x & 0xFFFF
+
+
+def permute(n: int, keys: List[int]) -> int:
+    """
+    Keyed bijection on [0, CODE_SPACE): a 4-round Feistel network on 32 bits
+    (keys: round_keys of the secret), cycle-walked until the output falls back
+    inside the code space (36^6 / 2^32 ~ 0.5, so about two passes on average).
+    """
+    while True:
+        left, right = n >> 16, n & 0xFFFF
+        for key in keys:
+            left, right = right, left ^ _round(right, key)
+        n = (left << 16) | right
+        if n < CODE_SPACE:
+            return n
+
+
+def encode(n: int) -> str:
+    chars = []
+    for _ in range(CODE_LENGTH):
+        n, digit = divmod(n, len(ALPHABET))
+        chars.append(ALPHABET[digit])
+    return "".join(reversed(chars))
+
+
+class RoomCodeAllocator:
+    """
+    Hands out room codes as permute(counter). Counters come from the single
+    room_code_sequence row in blocks of ROOM_CODE_BLOCK_SIZE, reserved in
+    their own transaction, so every worker gets disjoint blocks and no code
+    is ever handed out twice: there is nothing to probe in game_rooms.
+    The permutation key is random, generated once and kept in the same row
+    (code_key), so codes can't be guessed from each other or from the source.
+    """
+
+    def __init__(self, block_size: int = ROOM_CODE_BLOCK_SIZE):
+        self.block_size = block_size
+        self._next = 0
+        self._end = 0
+        self._keys: Optional[List[int]] = None
+        # Blocks reserved by concurrent refills, used before reserving another one
+        self._spare: List[Tuple[int, int]] = []
+        self._lock = threading.Lock()
+
+    def _reserve_block(self, db: Session) -> Tuple[int, int, str]:
+        sequence = models.RoomCodeSequence
+        bump = (
+            update(sequence)
+            .where(sequence.id == 1)
+            .values(next_value=sequence.next_value + self.block_size)
+            .returning(sequence.next_value, sequence.code_key)
+        )
+        # Separate transaction: the block stays reserved even if the caller rolls back
+        with db.get_bind().begin() as conn:
+            row = conn.execute(bump).first()
+            if row is None:
+                # Database created without the seeded row
+                conn.execute(
+                    dialect_insert(db, sequence).values(id=1, next_value=0, code_key=new_key()).on_conflict_do_nothing()
+                )
+                row = conn.execute(bump).first()
+            end, key = row
+            if key is None:
+                # Row seeded without a key: the first worker here sets it, the others read that one
+                conn.execute(update(sequence).where(sequence.id == 1, sequence.code_key.is_(None)).values(code_key=new_key()))
+                key = conn.execute(select(sequence.code_key).where(sequence.id == 1)).scalar()
+        if end > CODE_SPACE:
+            raise RuntimeError("Room code space exhausted")
+        return end - self.block_size, end, key
+
+    def next_code(self, db: Session) -> str:
+        while True:
+            with self._lock:
+                if self._next >= self._end and self._spare:
+                    self._next, self._end = self._spare.pop()
+                if self._next < self._end:
+                    n = self._next
+                    self._next += 1
+                    return encode(permute(n, self._keys))
+            # Reserved without holding the lock: with ASYNC_DB the query yields to the event loop,
+            # and another request blocking on the lock there would stall the whole loop
+            start, end, key = self._reserve_block(db)
+            with self._lock:
+                self._keys = round_keys(key)
+                if self._next >= self._end:
+                    self._next, self._end = start, end
+                else:
+                    # Another caller refilled first: keep this block for the next refill
+                    self._spare.append((start, end))
+
+room_code_allocator = RoomCodeAllocator()
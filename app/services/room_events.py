@@ -0,0 +1,100 @@
+import asyncio
+import json
+import os
+import threading
+from typing import AsyncIterator, Dict, Optional, Set, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from .. import metrics
+from .room_store import room_store
+
+# SSE keepalive period; also how often a subscriber re-reads the room store,
+# which is how results settled by another worker reach it
+ROOM_EVENTS_POLL = float(os.getenv("ROOM_EVENTS_POLL", "15"))
+
+# A settled room's state is replaced by its result (kept for the room store TTL),
+# so late subscribers and /end-rps-session can still read it and no move lands after it
+RESULT_FIELD = "result"
+
+# Events after which a room stream is closed
+FINAL_EVENTS = ("result", "expired")
+
+subscribers_gauge = metrics.Gauge("room_event_subscribers", "Open room event streams")
+events_published = metrics.Counter("room_events_published_total", "Room events published", ["type"])
+
+
+class RoomEventBroker:
+    """
+    In-process fan-out of room events to the SSE streams of this worker.
+    publish() is safe to call from the threadpool: delivery is handed to
+    each subscriber's event loop.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, room_code: str) -> Tuple[asyncio.AbstractEventLoop, asyncio.Queue]:
+        subscription = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.setdefault(room_code, set()).add(subscription)
+        subscribers_gauge.inc()
+        return subscription
+
+    def unsubscribe(self, room_code: str, subscription):
+        with self._lock:
+            subs = self._subscribers.get(room_code)
+            if subs is not None:
+                subs.discard(subscription)
+                if not subs:
+                    del self._subscribers[room_code]
+        subscribers_gauge.dec()
+
+    def publish(self, room_code: str, event: dict):
+        events_published.inc(type=event["type"])
+        with self._lock:
+            subs = list(self._subscribers.get(room_code, ()))
+        for loop, queue in subs:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+
+broker = RoomEventBroker()
+
+
+def store_result(room_code: str, event: dict):
+    room_store.update(room_code, lambda _: {RESULT_FIELD: json.dumps(event)})
+
+
+def stored_result(room_code: str) -> Optional[dict]:
+    fields = room_store.get(room_code)
+    return json.loads(fields[RESULT_FIELD]) if RESULT_FIELD in fields else None
+
+
+def format_sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def event_stream(room_code: str, subscription, final: Optional[dict] = None) -> AsyncIterator[str]:
+    """SSE body for one room: move events as they happen, closed after the result."""
+    try:
+        if final is not None:
+            yield format_sse(final)
+            return
+        _, queue = subscription
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), ROOM_EVENTS_POLL)
+            except asyncio.TimeoutError:
+                # Nothing pushed here: the room may have been settled by another worker
+                final = await run_in_threadpool(stored_result, room_code)
+                if final is not None:
+                    yield format_sse(final)
+                    return
+                yield ": keepalive\n\n"
+                continue
+            yield format_sse(event)
+            if event["type"] in FINAL_EVENTS:
+                return
+    finally:
+        broker.unsubscribe(room_code, subscription)
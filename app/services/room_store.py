@@ -0,0 +1,192 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+# Per-room state (RPS moves, board, ...) lives here until the room is settled.
+# ROOM_STORE=memory keeps it in this process, ROOM_STORE=sqlite shares it between uvicorn workers.
+ROOM_STORE = os.getenv("ROOM_STORE", "memory")
+ROOM_STORE_PATH = os.getenv("ROOM_STORE_PATH", "./room_state.db")
+ROOM_STATE_TTL = float(os.getenv("ROOM_STATE_TTL", "3600"))
+ROOM_STATE_MAX_ROOMS = int(os.getenv("ROOM_STATE_MAX_ROOMS", "100000"))
+
+Fields = Dict[str, str]
+
+
+class RoomStateStore(ABC):
+    """
+    Per-room string fields with TTL eviction and a cap on the number of rooms.
+    Writes go through update(), which is atomic per room.
+    """
+
+    def __init__(self, ttl: float = ROOM_STATE_TTL, max_rooms: int = ROOM_STATE_MAX_ROOMS):
+        self.ttl = ttl
+        self.max_rooms = max_rooms
+
+    @abstractmethod
+    def get(self, room_code: str) -> Fields:
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self, room_code: str, fn: Callable[[Fields], Fields]) -> Fields:
+        """Replace the room fields with fn(current fields) and return the new ones."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, room_code: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def evict_expired(self) -> int:
+        raise NotImplementedError
+
+    def set_field(self, room_code: str, key: str, value: str) -> Fields:
+        return self.update(room_code, lambda fields: {**fields, key: value})
+
+
+class InMemoryRoomStore(RoomStateStore):
+    """Single-process backend: an OrderedDict kept in least-recently-written order."""
+
+    def __init__(self, ttl: float = ROOM_STATE_TTL, max_rooms: int = ROOM_STATE_MAX_ROOMS):
+        super().__init__(ttl, max_rooms)
+        self._rooms: "OrderedDict[str, tuple]" = OrderedDict()  # room_code -> (expires_at, fields)
+        self._lock = threading.Lock()
+
+    def get(self, room_code: str) -> Fields:
+        with self._lock:
+            entry = self._rooms.get(room_code)
+            if not entry:
+                return {}
+            if entry[0] < time.monotonic():
+                del self._rooms[room_code]
+                return {}
+            return dict(entry[1])
+
+    def update(self, room_code: str, fn: Callable[[Fields], Fields]) -> Fields:
+        with self._lock:
+            now = time.monotonic()
+            entry = self._rooms.get(room_code)
+            current = entry[1] if entry and entry[0] >= now else {}
+            # fn may raise to reject the write: the stored state is only touched afterwards
+            fields = fn(dict(current))
+            self._rooms.pop(room_code, None)
+            self._rooms[room_code] = (now + self.ttl, fields)
+
+            # Writes refresh the TTL, so the oldest entries sit at the front
+            while self._rooms:
+                oldest_code, (expires_at, _) = next(iter(self._rooms.items()))
+                if expires_at >= now and len(self._rooms) <= self.max_rooms:
+                    break
+                del self._rooms[oldest_code]
+            return dict(fields)
+
+    def delete(self, room_code: str) -> None:
+        with self._lock:
+            self._rooms.pop(room_code, None)
+
+    def evict_expired(self) -> int:
+        with self._lock:
+            now = time.monotonic()
+            expired = [code for code, (expires_at, _) in self._rooms.items() if expires_at < now]
+            for code in expired:
+                del self._rooms[code]
+            return len(expired)
+
+    def __len__(self):
+        return len(self._rooms)
+
+
+class SQLiteRoomStore(RoomStateStore):
+    """
+    Backend shared by every worker on the host: one WAL-mode SQLite file,
+    one connection per thread, BEGIN IMMEDIATE around each read-modify-write.
+    """
+
+    # Run TTL / cap eviction once every N writes instead of on each one
+    EVICT_EVERY = 256
+
+    def __init__(self, path: str = ROOM_STORE_PATH, ttl: float = ROOM_STATE_TTL,
+                 max_rooms: int = ROOM_STATE_MAX_ROOMS):
+        super().__init__(ttl, max_rooms)
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS room_state ("
+                " room_code TEXT PRIMARY KEY, fields TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_room_state_expires_at ON room_state (expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, room_code: str) -> Fields:
+        row = self._conn().execute(
+            "SELECT fields FROM room_state WHERE room_code = ? AND expires_at >= ?",
+            (room_code, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def update(self, room_code: str, fn: Callable[[Fields], Fields]) -> Fields:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT fields FROM room_state WHERE room_code = ? AND expires_at >= ?",
+                (room_code, now),
+            ).fetchone()
+            fields = fn(json.loads(row[0]) if row else {})
+            conn.execute(
+                "INSERT INTO room_state (room_code, fields, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(room_code) DO UPDATE SET fields = excluded.fields, expires_at = excluded.expires_at",
+                (room_code, json.dumps(fields), now + self.ttl),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._writes += 1
+        if self._writes % self.EVICT_EVERY == 0:
+            self.evict_expired()
+        return fields
+
+    def delete(self, room_code: str) -> None:
+        self._conn().execute("DELETE FROM room_state WHERE room_code = ?", (room_code,))
+
+    def evict_expired(self) -> int:
+        conn = self._conn()
+        evicted = conn.execute("DELETE FROM room_state WHERE expires_at < ?", (time.time(),)).rowcount
+        # Over the cap: drop the rooms closest to expiring, i.e. the least recently written
+        overflow = conn.execute("SELECT COUNT(*) FROM room_state").fetchone()[0] - self.max_rooms
+        if overflow > 0:
+            evicted += conn.execute(
+                "DELETE FROM room_state WHERE room_code IN "
+                "(SELECT room_code FROM room_state ORDER BY expires_at LIMIT ?)",
+                (overflow,),
+            ).rowcount
+        return evicted
+
+
+def create_room_store(backend: Optional[str] = None) -> RoomStateStore:
+    backend = backend or ROOM_STORE
+    if backend == "memory":
+        return InMemoryRoomStore()
+    if backend == "sqlite":
+        return SQLiteRoomStore()
+    raise ValueError(f"Unknown ROOM_STORE backend: {backend}")
+
+
+room_store = create_room_store()
@@ -0,0 +1,201 @@
+import secrets
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from .. import models, schemas
+from .ratings import update_ratings
+
+# Leaderboard column bumped by each reported result
+RESULT_COUNTERS = {"win": "wins", "loss": "losses", "draw": "draws"}
+
+# Time series buckets kept in game_activity_rollup (UTC): granularity -> bucket length
+ROLLUP_GRANULARITIES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+# Keep IN (...) lists under SQLite's bound-parameter limit
+IN_CHUNK = 500
+
+
+def _chunks(items: List, size: int = IN_CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def dialect_insert(db: Session, model):
+    """INSERT construct with ON CONFLICT support for the bound dialect (sqlite / postgresql)."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(model)
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+    return sqlite_insert(model)
+
+
+def _resolve_ids(db: Session, model, key_col, rows: Dict) -> Dict:
+    """
+    Map each key to its primary key, inserting the missing rows.
+    rows: key -> column values for the row to create if the key is missing.
+    Two set-based queries at most (plus one per IN_CHUNK keys).
+    """
+    keys = list(rows)
+    ids = {}
+    for chunk in _chunks(keys):
+        ids.update(db.execute(select(key_col, model.id).where(key_col.in_(chunk))).all())
+
+    missing = [rows[k] for k in keys if k not in ids]
+    if missing:
+        # DO NOTHING: a concurrent batch may have created the same row meanwhile
+        db.execute(dialect_insert(db, model).on_conflict_do_nothing(), missing)
+        missing_keys = [k for k in keys if k not in ids]
+        for chunk in _chunks(missing_keys):
+            ids.update(db.execute(select(key_col, model.id).where(key_col.in_(chunk))).all())
+    return ids
+
+
+def upsert_counters(db: Session, model, key_columns: Sequence[str], deltas: Dict[Tuple, Dict[str, int]]):
+    """
+    deltas: key tuple (in key_columns order) -> {counter column: increment}
+    One INSERT ... ON CONFLICT (key) DO UPDATE SET counter = counter + excluded.counter
+    for the whole batch, so concurrent settlements never lose an increment.
+    """
+    if not deltas:
+        return
+    counters = list(next(iter(deltas.values())))
+    # Sorted keys: concurrent batches lock rows in the same order
+    rows = [{**dict(zip(key_columns, key)), **deltas[key]} for key in sorted(deltas)]
+
+    stmt = dialect_insert(db, model)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[getattr(model, column) for column in key_columns],
+        set_={counter: getattr(model, counter) + getattr(stmt.excluded, counter) for counter in counters},
+    )
+    db.execute(stmt, rows)
+
+
+def apply_leaderboard_deltas(db: Session, deltas: Dict[Tuple[int, int], Dict[str, int]]):
+    """deltas: (user_id, game_type_id) -> {"wins": n, "losses": n, "draws": n}"""
+    upsert_counters(db, models.LeaderboardEntry, ("user_id", "game_type_id"), deltas)
+
+
+def bucket_start(t: datetime, granularity: str) -> datetime:
+    t = t.replace(minute=0, second=0, microsecond=0)
+    return t.replace(hour=0) if granularity == "day" else t
+
+
+def rollup_deltas(results: List[Dict]) -> Dict[Tuple, Dict[str, int]]:
+    """(game_type_id, granularity, bucket) -> counter increments for game_activity_rollup."""
+    rollup = defaultdict(lambda: {"matches": 0, "sessions": 0, "wins": 0, "losses": 0, "draws": 0,
+                                  "total_duration_seconds": 0})
+    matches = set()
+    for r in results:
+        match = r.get("match", r["room_id"])
+        for granularity in ROLLUP_GRANULARITIES:
+            key = (r["game_type_id"], granularity, bucket_start(r["created_at"], granularity))
+            counters = rollup[key]
+            counters["sessions"] += 1
+            counter = RESULT_COUNTERS.get(r["result"])
+            if counter:
+                counters[counter] += 1
+            # A match counts once, with its duration, in the bucket of its first result
+            if (match, granularity) not in matches:
+                matches.add((match, granularity))
+                counters["matches"] += 1
+                counters["total_duration_seconds"] += r.get("duration_seconds") or 0
+    return rollup
+
+
+def record_results(db: Session, results: List[Dict]):
+    """
+    Insert GameSession rows, apply the aggregated leaderboard,
+    user_game_stats and game_activity_rollup deltas and update the Elo ratings of 1v1 matches.
+    results: dicts with user_id, game_type_id, room_id, result, score, duration_seconds
+    and optionally match (results of one match share it; defaults to room_id),
+    created_at (settle time; defaults to now) and ranked (false: no leaderboard
+    row and no rating, e.g. the AI seat of a solo room; defaults to true).
+    Returns the rating change per (user_id, game_type_id). The caller commits.
+    """
+    if not results:
+        return {}
+    now = datetime.utcnow()
+    results = [r if r.get("created_at") else {**r, "created_at": now} for r in results]
+    # Stored per session so recompute_ratings can tell two matches of a room apart
+    match_ids = {}
+    for r in results:
+        match = r.get("match", r["room_id"])
+        if match not in match_ids:
+            match_ids[match] = secrets.randbits(63)
+    leaderboard = defaultdict(lambda: {"wins": 0, "losses": 0, "draws": 0})
+    user_stats = defaultdict(lambda: {"total_games": 0, "wins": 0, "losses": 0, "draws": 0, "total_score": 0})
+    for r in results:
+        key = (r["user_id"], r["game_type_id"])
+        counter = RESULT_COUNTERS.get(r["result"])
+        if counter:
+            if r.get("ranked", True):
+                leaderboard[key][counter] += 1
+            user_stats[key][counter] += 1
+        user_stats[key]["total_games"] += 1
+        user_stats[key]["total_score"] += r.get("score") or 0
+
+    db.execute(insert(models.GameSession), [
+        {**{key: r.get(key) for key in ("user_id", "room_id", "result", "score", "duration_seconds", "created_at")},
+         "match_id": match_ids[r.get("match", r["room_id"])]}
+        for r in results
+    ])
+    apply_leaderboard_deltas(db, leaderboard)
+    upsert_counters(db, models.UserGameStats, ("user_id", "game_type_id"), user_stats)
+    upsert_counters(db, models.GameActivityRollup, ("game_type_id", "granularity", "bucket"), rollup_deltas(results))
+    return update_ratings(db, results)
+
+
+def report_results(db: Session, reports: List[schemas.GameReport]) -> List[Dict]:
+    """
+    record_results rows for reported matches: set-based lookups for game
+    types, rooms and users (missing ones are created), one match per report.
+    """
+    game_type_ids = _resolve_ids(
+        db, models.GameType, models.GameType.name,
+        {r.game_type: {"name": r.game_type} for r in reports},
+    )
+
+    room_rows = {}
+    for r in reports:
+        room_rows.setdefault(r.room_code, {
+            "code": r.room_code, "game_type_id": game_type_ids[r.game_type], "is_active": True,
+        })
+    room_ids = _resolve_ids(db, models.GameRoom, models.GameRoom.code, room_rows)
+
+    user_ids = _resolve_ids(
+        db, models.User, models.User.telegram_id,
+        {p.telegram_id: {"telegram_id": p.telegram_id, "username": "unknown"}
+         for r in reports for p in r.players},
+    )
+
+    return [
+        {
+            "user_id": user_ids[p.telegram_id],
+            "game_type_id": game_type_ids[r.game_type],
+            "room_id": room_ids[r.room_code],
+            "result": p.result,
+            "score": p.score,
+            "duration_seconds": r.duration_seconds,
+            "match": i,
+        }
+        for i, r in enumerate(reports) for p in r.players
+    ]
+
+
+def record_reports(db: Session, reports: Iterable[schemas.GameReport]) -> Dict[str, int]:
+    """
+    Settle a batch of reported matches in one transaction:
+    one bulk insert of GameSession rows and one aggregated upsert per counter table.
+    """
+    reports = list(reports)
+    if not reports:
+        return {"reports": 0, "sessions": 0}
+
+    results = report_results(db, reports)
+    record_results(db, results)
+    db.commit()
+    return {"reports": len(reports), "sessions": len(results)}
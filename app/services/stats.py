@@ -0,0 +1,305 @@
+import logging
+import os
+from datetime import datetime, timezone
+from fastapi import HTTPException
+from typing import Optional
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.orm import Session
+from .. import metrics, models, schemas
+from . import cache, event_log
+from .settlement import ROLLUP_GRANULARITIES, bucket_start, record_reports
+
+logger = logging.getLogger("uvicorn")
+
+# Most buckets one time series request may cover
+TIMESERIES_MAX_POINTS = int(os.getenv("TIMESERIES_MAX_POINTS", "1000"))
+# Range served when since is not given, in buckets (two days hourly, a month daily)
+TIMESERIES_DEFAULT_POINTS = {"hour": 48, "day": 30}
+
+
+# /start on every re-registration: most syncs change nothing
+user_syncs = metrics.Counter("user_syncs_total", "POST /api/users/sync calls by outcome", ["result"])
+
+
+def sync_user(db: Session, user: schemas.UserSync):
+    # Fast path: one indexed read; an unchanged user is neither written nor committed
+    row = db.query(models.User.id, models.User.username).filter_by(telegram_id=user.telegram_id).first()
+    if row is not None and row.username == (user.username or row.username):
+        user_syncs.inc(result="unchanged")
+        return {"status": "synced", "user_id": row.id}
+
+    if row is not None:
+        # Only the username can change (a None username never overwrites, see above)
+        db.query(models.User).filter_by(id=row.id).update({"username": user.username})
+    else:
+        db_user = models.User(
+            telegram_id=user.telegram_id,
+            username=user.username or "unknown"
+        )
+        db.add(db_user)
+
+    try:
+        db.commit()
+        user_id = row.id if row is not None else db_user.id  # new user: id loaded after the commit
+        cache.invalidate_user(user.telegram_id)
+        user_syncs.inc(result="updated" if row is not None else "created")
+        logger.debug(f"User {user_id} synced")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to commit user {user.telegram_id}: {e}")
+        return {"status": "error", "details": str(e)}
+
+    return {"status": "synced", "user_id": user_id}
+
+
+def _log_reports(reports):
+    # Write-behind: durable in the event log, applied to the tables by its applier
+    try:
+        event_log.log.append({"type": "reports", "reports": [r.model_dump() for r in reports]})
+    except event_log.EventLogError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"reports": len(reports), "sessions": sum(len(r.players) for r in reports)}
+
+
+def report_game(db: Session, report: schemas.GameReport):
+    if event_log.log is not None:
+        _log_reports([report])
+    else:
+        record_reports(db, [report])
+    return {"status": "recorded"}
+
+
+def report_games_batch(db: Session, batch: schemas.GameReportBatch):
+    if event_log.log is not None:
+        if not batch.reports:
+            return {"status": "recorded", "reports": 0, "sessions": 0}
+        return {"status": "recorded", **_log_reports(batch.reports)}
+    return {"status": "recorded", **record_reports(db, batch.reports)}
+
+
+def _leaderboard_query(db: Session, game_type_id: int):
+    # Usernames come from the same join: no lazy e.user load per row
+    return (
+        db.query(
+            models.LeaderboardEntry.user_id,
+            models.LeaderboardEntry.wins,
+            models.LeaderboardEntry.losses,
+            models.LeaderboardEntry.draws,
+            models.LeaderboardEntry.rating,
+            models.User.telegram_id,
+            models.User.username,
+        )
+        .join(models.User, models.LeaderboardEntry.user_id == models.User.id)
+        .filter(models.LeaderboardEntry.game_type_id == game_type_id)
+    )
+
+
+# Ranking columns, each backed by an index on (game_type_id, column desc, user_id)
+RANKINGS = {"wins": models.LeaderboardEntry.wins, "rating": models.LeaderboardEntry.rating}
+
+
+def _ranked_before(column, value, user_id: int):
+    # Ranking order is (column desc, user_id asc): rows strictly ahead of (value, user_id)
+    return or_(
+        column > value,
+        and_(column == value, models.LeaderboardEntry.user_id < user_id),
+    )
+
+
+def _ranked_after(column, value, user_id: int):
+    return or_(
+        column < value,
+        and_(column == value, models.LeaderboardEntry.user_id > user_id),
+    )
+
+
+def _entry_out(row, rank: int):
+    return schemas.LeaderboardEntryOut(
+        telegram_id=row.telegram_id,
+        username=row.username,
+        wins=row.wins,
+        losses=row.losses,
+        draws=row.draws,
+        rating=row.rating,
+        rank=rank
+    )
+
+
+def get_leaderboard(db: Session, game_type: str, limit: int, cursor: Optional[str] = None, sort: str = "wins"):
+    """
+    One keyset page of the leaderboard, ranked by wins or by rating.
+    The cursor is "<value>:<user_id>:<rank>" of the last row served, so each
+    page is an index range read on (game_type_id, value, user_id) and ranks
+    carry over without counting.
+    """
+    game_type_id = cache.get_game_type_id(db, game_type)
+    if not game_type_id:
+        return schemas.LeaderboardPageOut(entries=[])
+
+    column = RANKINGS[sort]
+    query = _leaderboard_query(db, game_type_id)
+    rank = 0
+    if cursor:
+        try:
+            value, user_id, rank = cursor.split(":")
+            value = int(value) if sort == "wins" else float(value)
+            user_id, rank = int(user_id), int(rank)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(_ranked_after(column, value, user_id))
+
+    rows = (
+        query.order_by(column.desc(), models.LeaderboardEntry.user_id.asc())
+        .limit(limit)
+        .all()
+    )
+    entries = [_entry_out(row, rank + i + 1) for i, row in enumerate(rows)]
+
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        # repr() round-trips floats exactly, so the next page starts right after this row
+        next_cursor = f"{getattr(last, sort)!r}:{last.user_id}:{rank + len(rows)}"
+    return schemas.LeaderboardPageOut(entries=entries, next_cursor=next_cursor)
+
+
+def get_user_rank(db: Session, telegram_id: int, game_type: str, radius: int, sort: str = "wins"):
+    """A user's rank, the table size and up to `radius` neighbours on each side."""
+    game_type_id = cache.get_game_type_id(db, game_type)
+    if not game_type_id:
+        raise HTTPException(status_code=404, detail="Game not found")
+
+    user_id = cache.get_user_id(db, telegram_id)
+    me = user_id and _leaderboard_query(db, game_type_id).filter(models.LeaderboardEntry.user_id == user_id).first()
+    if not me:
+        raise HTTPException(status_code=404, detail="User not on the leaderboard")
+
+    # Both counts are range scans over the ranking index, not over the table
+    column = RANKINGS[sort]
+    value = getattr(me, sort)
+    entries = db.query(func.count()).select_from(models.LeaderboardEntry).filter(
+        models.LeaderboardEntry.game_type_id == game_type_id
+    )
+    ahead = entries.filter(_ranked_before(column, value, me.user_id)).scalar()
+    total = entries.scalar()
+    rank = ahead + 1
+
+    above = (
+        _leaderboard_query(db, game_type_id)
+        .filter(_ranked_before(column, value, me.user_id))
+        .order_by(column.asc(), models.LeaderboardEntry.user_id.desc())
+        .limit(radius)
+        .all()
+    )
+    below = (
+        _leaderboard_query(db, game_type_id)
+        .filter(_ranked_after(column, value, me.user_id))
+        .order_by(column.desc(), models.LeaderboardEntry.user_id.asc())
+        .limit(radius)
+        .all()
+    )
+
+    neighbours = [_entry_out(row, rank - len(above) + i) for i, row in enumerate(reversed(above))]
+    neighbours += [_entry_out(row, rank + 1 + i) for i, row in enumerate(below)]
+    return schemas.LeaderboardRankOut(rank=rank, total=total, entry=_entry_out(me, rank), neighbours=neighbours)
+
+
+def debug_users(db: Session):
+    users = db.query(models.User).all()
+    return [{"id": u.id, "telegram_id": u.telegram_id, "username": u.username} for u in users]
+
+
+def aggregate_user_stats(db: Session, user_id: int, game_type_id: int):
+    """Totals straight from game_sessions: one GROUP BY with SUM(CASE ...), no ORM objects."""
+    return (
+        db.query(
+            func.count(models.GameSession.id).label("total_games"),
+            func.sum(case((models.GameSession.result == "win", 1), else_=0)).label("wins"),
+            func.sum(case((models.GameSession.result == "loss", 1), else_=0)).label("losses"),
+            func.sum(case((models.GameSession.result == "draw", 1), else_=0)).label("draws"),
+            func.sum(func.coalesce(models.GameSession.score, 0)).label("total_score"),
+        )
+        .join(models.GameRoom, models.GameSession.room_id == models.GameRoom.id)
+        .filter(models.GameSession.user_id == user_id, models.GameRoom.game_type_id == game_type_id)
+        .group_by(models.GameSession.user_id)
+        .first()
+    )
+
+
+def user_stats(db: Session, telegram_id: int, game_type: str):
+    user_id = cache.get_user_id(db, telegram_id)
+    if not user_id:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    game_type_id = cache.get_game_type_id(db, game_type)
+    if not game_type_id:
+        raise HTTPException(status_code=404, detail="Game not found")
+
+    # Rollup maintained at settlement: a primary-key lookup however long the history is
+    stats = db.get(models.UserGameStats, (user_id, game_type_id))
+    if stats is None:
+        # No rollup row yet (e.g. no settled match): fall back to the aggregate query
+        stats = aggregate_user_stats(db, user_id, game_type_id)
+
+    total_games = stats.total_games if stats else 0
+    return schemas.UserStatsOut(
+        total_games=total_games,
+        wins=stats.wins if stats else 0,
+        losses=stats.losses if stats else 0,
+        draws=stats.draws if stats else 0,
+        average_score=stats.total_score / total_games if total_games else 0
+    )
+
+
+def _naive_utc(t: Optional[datetime]) -> Optional[datetime]:
+    # Buckets are stored as naive UTC: convert timezone-aware bounds
+    return t.astimezone(timezone.utc).replace(tzinfo=None) if t is not None and t.tzinfo else t
+
+
+def get_timeseries(db: Session, game_type: str, granularity: str,
+                   since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """
+    Activity and win rate per bucket, read from game_activity_rollup only:
+    one index range read of at most TIMESERIES_MAX_POINTS rows, whatever the history size.
+    Buckets without matches are returned with zeros, so the series has no gaps.
+    """
+    game_type_id = cache.get_game_type_id(db, game_type)
+    if not game_type_id:
+        raise HTTPException(status_code=404, detail="Game not found")
+
+    step = ROLLUP_GRANULARITIES[granularity]
+    since, until = _naive_utc(since), _naive_utc(until)
+    end = bucket_start(until or datetime.utcnow(), granularity) + step
+    start = bucket_start(since, granularity) if since else end - step * TIMESERIES_DEFAULT_POINTS[granularity]
+    if start >= end:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    if (end - start) / step > TIMESERIES_MAX_POINTS:
+        raise HTTPException(status_code=400, detail=f"Range covers more than {TIMESERIES_MAX_POINTS} buckets")
+
+    rollup = models.GameActivityRollup
+    rows = {
+        row.bucket: row
+        for row in db.query(rollup).filter(
+            rollup.game_type_id == game_type_id,
+            rollup.granularity == granularity,
+            rollup.bucket >= start,
+            rollup.bucket < end,
+        )
+    }
+
+    points = []
+    bucket = start
+    while bucket < end:
+        row = rows.get(bucket)
+        if row is None:
+            points.append(schemas.TimeseriesPointOut(bucket=bucket, matches=0, sessions=0, wins=0, losses=0,
+                                                     draws=0, win_rate=0, average_duration_seconds=0))
+        else:
+            points.append(schemas.TimeseriesPointOut(
+                bucket=bucket, matches=row.matches, sessions=row.sessions,
+                wins=row.wins, losses=row.losses, draws=row.draws,
+                win_rate=row.wins / row.sessions if row.sessions else 0,
+                average_duration_seconds=row.total_duration_seconds / row.matches if row.matches else 0,
+            ))
+        bucket += step
+    return schemas.TimeseriesOut(game_type=game_type, granularity=granularity, points=points)
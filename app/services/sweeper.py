@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, exists, or_, select, update
+from sqlalchemy.orm import Session
+
+from .. import metrics, models
+from ..database import run_in_session
+from .room_events import broker
+from .room_store import ROOM_STATE_TTL, room_store
+
+logger = logging.getLogger("uvicorn")
+
+ROOM_SWEEPER_ENABLED = os.getenv("ROOM_SWEEPER_ENABLED", "true").lower() in ("1", "true", "yes")
+ROOM_SWEEP_INTERVAL = float(os.getenv("ROOM_SWEEP_INTERVAL", "60"))
+ROOM_SWEEP_BATCH = int(os.getenv("ROOM_SWEEP_BATCH", "500"))
+# Upper bound on batches per run, so one run never holds the database for long
+ROOM_SWEEP_MAX_BATCHES = int(os.getenv("ROOM_SWEEP_MAX_BATCHES", "20"))
+# Active rooms without a move for this long are closed. Moves bump updated_at at most every
+# ROOM_TOUCH_INTERVAL (game_logic.py), so a room in play is never closed under its players
+ROOM_IDLE_TIMEOUT = float(os.getenv("ROOM_IDLE_TIMEOUT", str(ROOM_STATE_TTL)))
+# Closed rooms are deleted after this long, unless game sessions reference them (kept as history)
+ROOM_RETENTION = float(os.getenv("ROOM_RETENTION", "600"))
+
+rooms_expired = metrics.Counter("room_sweeper_rooms_expired_total", "Idle active rooms closed by the sweeper")
+rooms_deleted = metrics.Counter("room_sweeper_rooms_deleted_total", "Closed rooms deleted by the sweeper")
+sweep_runs = metrics.Counter("room_sweeper_runs_total", "Sweeper runs", ["outcome"])
+sweep_duration = metrics.Histogram("room_sweeper_run_seconds", "Duration of one sweeper run")
+sweep_lag = metrics.Gauge(
+    "room_sweeper_lag_seconds", "How far past its deadline the oldest room left by the last run is"
+)
+
+
+def _stale(cutoff: datetime):
+    return or_(models.GameRoom.updated_at < cutoff, models.GameRoom.updated_at.is_(None))
+
+
+def sweep_once(db: Session) -> dict:
+    """One bounded pass: close idle active rooms, then delete old closed rooms without sessions."""
+    now = datetime.utcnow()
+    idle_cutoff = now - timedelta(seconds=ROOM_IDLE_TIMEOUT)
+    retention_cutoff = now - timedelta(seconds=ROOM_RETENTION)
+
+    has_sessions = exists().where(models.GameSession.room_id == models.GameRoom.id)
+    expired_filter = (models.GameRoom.is_active.is_(True), _stale(idle_cutoff))
+    deletable_filter = (models.GameRoom.is_active.is_(False), _stale(retention_cutoff), ~has_sessions)
+
+    expired = deleted = 0
+    for _ in range(ROOM_SWEEP_MAX_BATCHES):
+        rows = db.execute(
+            select(models.GameRoom.id, models.GameRoom.code)
+            .where(*expired_filter)
+            .order_by(models.GameRoom.updated_at)
+            .limit(ROOM_SWEEP_BATCH)
+        ).all()
+        if not rows:
+            break
+        db.execute(
+            update(models.GameRoom)
+            .where(models.GameRoom.id.in_([row.id for row in rows]))
+            .values(is_active=False)
+        )
+        db.commit()
+        for row in rows:
+            room_store.delete(row.code)
+            broker.publish(row.code, {"type": "expired", "room_code": row.code})
+        expired += len(rows)
+        if len(rows) < ROOM_SWEEP_BATCH:
+            break
+
+    for _ in range(ROOM_SWEEP_MAX_BATCHES):
+        ids = db.execute(
+            select(models.GameRoom.id)
+            .where(*deletable_filter)
+            .order_by(models.GameRoom.updated_at)
+            .limit(ROOM_SWEEP_BATCH)
+        ).scalars().all()
+        if not ids:
+            break
+        db.execute(delete(models.GameRoom).where(models.GameRoom.id.in_(ids)))
+        db.commit()
+        deleted += len(ids)
+        if len(ids) < ROOM_SWEEP_BATCH:
+            break
+
+    # Lag: how long the oldest room still waiting for the sweeper has been past its deadline
+    def oldest(*where):
+        return db.execute(
+            select(models.GameRoom.updated_at).where(*where).order_by(models.GameRoom.updated_at).limit(1)
+        ).scalar()
+
+    oldest_idle = oldest(*expired_filter)
+    oldest_closed = oldest(*deletable_filter)
+    lag = max(
+        (idle_cutoff - oldest_idle).total_seconds() if oldest_idle else 0,
+        (retention_cutoff - oldest_closed).total_seconds() if oldest_closed else 0,
+        0,
+    )
+    sweep_lag.set(lag)
+
+    rooms_expired.inc(expired)
+    rooms_deleted.inc(deleted)
+    return {"expired": expired, "deleted": deleted, "lag_seconds": lag}
+
+
+async def run_sweeper(interval: float = ROOM_SWEEP_INTERVAL):
+    """Background loop started with the app; cancel the task to stop it."""
+    while True:
+        started = time.perf_counter()
+        try:
+            result = await run_in_session(sweep_once)
+            sweep_runs.inc(outcome="ok")
+            if result["expired"] or result["deleted"]:
+                logger.info(f"Room sweeper: {result}")
+        except Exception as e:
+            sweep_runs.inc(outcome="error")
+            logger.error(f"Room sweeper failed: {e}")
+        sweep_duration.observe(time.perf_counter() - started)
+        await asyncio.sleep(interval)
@@ -0,0 +1,63 @@
+"""
+Export game sessions, a leaderboard or users as NDJSON or CSV, streamed
+from the database in chunks (constant memory whatever the table size).
+
+    python -m app.tools.export sessions --game-type rps --since 2025-01-01 -o sessions.ndjson
+    python -m app.tools.export leaderboard --game-type rps --sort rating --format csv -o rps.csv
+    python -m app.tools.export users --format csv > users.csv
+
+Reads the replica when READ_DATABASE_URL is set, the primary otherwise.
+The same exports are served by the API under /api/export/.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+
+from ..database import ReadSessionLocal
+from ..services import cache, export
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("table", choices=["sessions", "leaderboard", "users"])
+    parser.add_argument("--game-type", help="required for leaderboard")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="sessions settled at or after (UTC)")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="sessions settled before (UTC)")
+    parser.add_argument("--sort", choices=sorted(export.RANKINGS), default="wins", help="leaderboard order")
+    parser.add_argument("--format", choices=sorted(export.FORMATS), default="ndjson")
+    parser.add_argument("--chunk-size", type=int, default=export.EXPORT_CHUNK_SIZE)
+    parser.add_argument("-o", "--output", help="file to write (default: stdout)")
+    args = parser.parse_args()
+    if args.table == "leaderboard" and not args.game_type:
+        parser.error("leaderboard needs --game-type")
+
+    t0 = time.perf_counter()
+    with ReadSessionLocal() as db:
+        game_type_id = None
+        if args.game_type:
+            game_type_id = cache.get_game_type_id(db, args.game_type)
+            if not game_type_id:
+                raise SystemExit(f"Unknown game type: {args.game_type}")
+
+        if args.table == "sessions":
+            query = export.sessions_query(game_type_id, args.since, args.until)
+        elif args.table == "leaderboard":
+            query = export.leaderboard_query(game_type_id, args.sort)
+        else:
+            query = export.users_query(game_type_id)
+
+        out = open(args.output, "w", newline="") if args.output else sys.stdout
+        try:
+            for chunk in export.iter_export(db, query, args.format, rank=args.table == "leaderboard",
+                                            chunk_size=args.chunk_size):
+                out.write(chunk)
+        finally:
+            if args.output:
+                out.close()
+
+    print(f"exported {args.table} in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Rebuild every leaderboard rating from the full game_sessions history.
+
+    python -m app.tools.recompute_ratings [--k 32] [--dry-run]
+
+Sessions are read in id (i.e. insertion) order. Consecutive sessions
+sharing a match_id form one match, as record_results inserted them; like
+the live path, only matches of exactly two players are rated.
+The AI player's sessions are skipped: solo matches are unranked.
+The matches are split into conflict-free batches: no player appears
+twice in a batch, and every player's matches keep their order. Each
+batch is then one vectorized NumPy Elo step, so the replay costs a few
+array operations per batch instead of ORM updates per row.
+"""
+import argparse
+import time
+
+import numpy as np
+from sqlalchemy import bindparam, text, update
+
+from .. import models
+from ..database import engine as default_engine
+from ..services.game_logic import AI_TELEGRAM_ID
+from ..services.ratings import RATING_INITIAL, RATING_K, RESULT_SCORE
+
+FETCH_SIZE = 200_000
+WRITE_CHUNK = 10_000
+# Matches scheduled together; see schedule()
+SCHEDULE_WINDOW = 1 << 16
+_NO_MATCH = np.iinfo(np.int64).max
+
+SESSIONS_SQL = text(
+    "SELECT s.match_id, s.user_id, r.game_type_id, s.result "
+    "FROM game_sessions s JOIN game_rooms r ON r.id = s.room_id "
+    "JOIN users u ON u.id = s.user_id "
+    "WHERE u.telegram_id != :ai_telegram_id "
+    "ORDER BY s.id"
+)
+
+
+def load_sessions(conn, fetch_size: int = FETCH_SIZE):
+    """
+    (match, user_id, game_type_id, score) arrays; score is NaN for unrated results.
+    match numbers the runs of consecutive sessions sharing a match_id.
+    """
+    starts, users, game_types, scores = [], [], [], []
+    last = None
+    result = conn.execution_options(stream_results=True).execute(SESSIONS_SQL, {"ai_telegram_id": AI_TELEGRAM_ID})
+    while True:
+        rows = result.fetchmany(fetch_size)
+        if not rows:
+            break
+        match_id, user, game_type, outcome = zip(*rows)
+        match_arr = np.array(match_id, dtype=np.int64)
+        start = np.empty(len(rows), dtype=bool)
+        start[0] = match_id[0] != last
+        start[1:] = match_arr[1:] != match_arr[:-1]
+        last = match_id[-1]
+        starts.append(start)
+        users.append(np.array(user, dtype=np.int64))
+        game_types.append(np.array(game_type, dtype=np.int64))
+        scores.append(np.array([RESULT_SCORE.get(o, np.nan) for o in outcome], dtype=np.float64))
+    if not starts:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, np.empty(0)
+    match = np.cumsum(np.concatenate(starts)) - 1
+    return match, np.concatenate(users), np.concatenate(game_types), np.concatenate(scores)
+
+
+def pair_matches(match, user, game_type, score):
+    """
+    Matches as (a, b, score of a) over player indexes, plus the (user_id, game_type_id)
+    of each index. Only runs of exactly two sessions are matches: as in ratings.rated_matches,
+    groups of three or more players are not rated.
+    """
+    n = len(match)
+    first = np.flatnonzero(np.r_[True, match[1:] != match[:-1]]) if n else np.empty(0, dtype=np.int64)
+    size = np.diff(np.r_[first, n])
+
+    a = first[size == 2]
+    b = a + 1
+    keep = (game_type[a] == game_type[b]) & ~np.isnan(score[a])
+    a, b = a[keep], b[keep]
+
+    # One dense index per (user_id, game_type_id)
+    stride = int(game_type.max(initial=0)) + 1
+    keys, index = np.unique(user * stride + game_type, return_inverse=True)
+    players = np.stack([keys // stride, keys % stride], axis=1)
+    return index[a], index[b], score[a], players
+
+
+def schedule(a, b, n_players: int, window: int = SCHEDULE_WINDOW):
+    """
+    Batch number of each match. Matches are taken in windows of consecutive
+    matches; inside a window each round batches the matches that are the
+    earliest pending one of both their players. Rounds per window stay
+    small as long as the window is small next to the number of players.
+    """
+    batches = np.empty(len(a), dtype=np.int64)
+    first = np.full(n_players, _NO_MATCH, dtype=np.int64)
+    batch = 0
+    for start in range(0, len(a), window):
+        pending = np.arange(start, min(start + window, len(a)))
+        while len(pending):
+            pa, pb = a[pending], b[pending]
+            np.minimum.at(first, pa, pending)
+            np.minimum.at(first, pb, pending)
+            ready = (first[pa] == pending) & (first[pb] == pending)
+            batches[pending[ready]] = batch
+            first[pa] = _NO_MATCH
+            first[pb] = _NO_MATCH
+            pending = pending[~ready]
+            batch += 1
+    return batches
+
+
+def replay(a, b, score, n_players: int, k: float = RATING_K, initial: float = RATING_INITIAL):
+    """Final ratings of n_players after playing the matches in order."""
+    ratings = np.full(n_players, initial, dtype=np.float64)
+    if not len(a):
+        return ratings
+    batches = schedule(a, b, n_players)
+    order = np.argsort(batches, kind="stable")
+    bounds = np.flatnonzero(np.diff(batches[order])) + 1
+    for chunk in np.split(order, bounds):
+        pa, pb = a[chunk], b[chunk]
+        expected = 1.0 / (1.0 + 10.0 ** ((ratings[pb] - ratings[pa]) / 400.0))
+        delta = k * (score[chunk] - expected)
+        # No player repeats inside a batch, so these fancy-index updates don't collide
+        ratings[pa] += delta
+        ratings[pb] -= delta
+    return ratings
+
+
+def write_ratings(conn, players, ratings, initial: float = RATING_INITIAL):
+    table = models.LeaderboardEntry.__table__
+    conn.execute(update(table).values(rating=initial))
+    stmt = (
+        update(table)
+        .where(table.c.user_id == bindparam("b_user_id"), table.c.game_type_id == bindparam("b_game_type_id"))
+        .values(rating=bindparam("b_rating"))
+    )
+    rows = [
+        {"b_user_id": int(u), "b_game_type_id": int(g), "b_rating": float(r)}
+        for (u, g), r in zip(players.tolist(), ratings.tolist())
+    ]
+    for i in range(0, len(rows), WRITE_CHUNK):
+        conn.execute(stmt, rows[i:i + WRITE_CHUNK])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=float, default=RATING_K)
+    parser.add_argument("--dry-run", action="store_true", help="compute and print, don't write")
+    args = parser.parse_args()
+
+    timings = {}
+    t0 = time.perf_counter()
+    with default_engine.connect() as conn:
+        match, user, game_type, score = load_sessions(conn)
+    timings["load"] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    a, b, s, players = pair_matches(match, user, game_type, score)
+    ratings = replay(a, b, s, len(players), k=args.k)
+    timings["replay"] = time.perf_counter() - t0
+
+    if not args.dry_run:
+        t0 = time.perf_counter()
+        with default_engine.begin() as conn:
+            write_ratings(conn, players, ratings)
+        timings["write"] = time.perf_counter() - t0
+
+    print(f"{len(match):,} sessions, {len(a):,} rated matches, {len(players):,} ratings")
+    print("  ".join(f"{step} {seconds:.2f}s" for step, seconds in timings.items()))
+    if args.dry_run and len(players):
+        top = np.argsort(-ratings)[:10]
+        for i in top:
+            print(f"user {players[i][0]} game type {players[i][1]}: {ratings[i]:.1f}")
+
+
+if __name__ == "__main__":
+    main()
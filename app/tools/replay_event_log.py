@@ -0,0 +1,75 @@
+"""
+Apply the settlement event log to the database, with the API stopped.
+
+    python -m app.tools.replay_event_log            # apply what is past the checkpoint
+    python -m app.tools.replay_event_log --rebuild  # empty the derived tables, replay from the start
+
+The default run is the same catch-up the API does on startup.
+
+--rebuild deletes game_sessions, leaderboard, user_game_stats and
+game_activity_rollup, then replays every event in the log, ratings
+included. Only use it if the log holds the full history, i.e. it has been
+enabled since the tables were empty: results recorded before that are not
+in the log. The applier retires applied segments: the rebuild reads them
+from EVENT_LOG_ARCHIVE_DIR (--archive-dir), and refuses to start if the
+segments found don't begin at seq 1 (deleted, no archive).
+"""
+import argparse
+import sys
+import time
+
+from sqlalchemy import delete
+
+from .. import models
+from ..database import SessionLocal
+from ..services.event_log import (
+    EVENT_LOG_APPLY_BATCH, EVENT_LOG_ARCHIVE_DIR, EVENT_LOG_DIR, EventLogReader, apply_events, get_checkpoint,
+    list_segments, lock_directory, set_checkpoint,
+)
+
+DERIVED_TABLES = (models.GameSession, models.LeaderboardEntry, models.UserGameStats, models.GameActivityRollup)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=EVENT_LOG_DIR)
+    parser.add_argument("--batch", type=int, default=EVENT_LOG_APPLY_BATCH)
+    parser.add_argument("--rebuild", action="store_true", help="empty the derived tables and replay the whole log")
+    parser.add_argument("--archive-dir", default=EVENT_LOG_ARCHIVE_DIR,
+                        help="retired segments, read by --rebuild (default EVENT_LOG_ARCHIVE_DIR)")
+    args = parser.parse_args()
+
+    if lock_directory(args.dir) is None:
+        sys.exit(f"{args.dir} is locked: stop the API (or the other replay) first. Nothing changed.")
+
+    archive_dir = args.archive_dir if args.rebuild else None
+    if args.rebuild:
+        segments = list_segments(args.dir, *([archive_dir] if archive_dir else []))
+        if segments and segments[0][0] != 1:
+            sys.exit(f"The log starts at seq {segments[0][0]}: earlier segments were deleted, "
+                     f"a rebuild needs them (archived with EVENT_LOG_ARCHIVE_DIR). Nothing changed.")
+
+    t0 = time.perf_counter()
+    with SessionLocal() as db:
+        if args.rebuild:
+            for model in DERIVED_TABLES:
+                db.execute(delete(model))
+            set_checkpoint(db, 0)
+            db.commit()
+        reader = EventLogReader(args.dir, get_checkpoint(db), archive_dir)
+        start_seq = reader.applied_seq
+        seen_rooms = set()
+        applied = 0
+        while True:
+            events, position = reader.read(args.batch)
+            if not events:
+                break
+            apply_events(db, events, rebuild=args.rebuild, seen_rooms=seen_rooms)
+            reader.advance(position, events[-1][0])
+            applied += len(events)
+
+    print(f"applied {applied} events (seq {start_seq} -> {reader.applied_seq}) in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Local stand-in for a read replica: copies the primary SQLite file into
+the replica file every few seconds (sqlite3 online backup, consistent
+while the API keeps writing).
+
+    python -m app.tools.sqlite_replica --interval 2
+    READ_DATABASE_URL=sqlite:///./game_replica.db uvicorn app.main:app
+
+The copy interval is the replication lag: reads right after a write see
+stale data unless the client is pinned to the primary
+(READ_YOUR_WRITES_WINDOW should be longer than the interval).
+"""
+import argparse
+import sqlite3
+import time
+
+from ..database import READ_DATABASE_URL, SQLALCHEMY_DATABASE_URL
+
+
+def sqlite_path(url: str) -> str:
+    if not url.startswith("sqlite"):
+        raise SystemExit(f"Not a SQLite URL: {url}")
+    return url.partition("://")[2][1:]
+
+
+def copy(primary: str, replica: str):
+    src = sqlite3.connect(primary)
+    dst = sqlite3.connect(replica)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--primary", default=SQLALCHEMY_DATABASE_URL)
+    parser.add_argument("--replica", default=READ_DATABASE_URL or "sqlite:///./game_replica.db")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between copies")
+    parser.add_argument("--once", action="store_true", help="copy once and exit")
+    args = parser.parse_args()
+
+    primary, replica = sqlite_path(args.primary), sqlite_path(args.replica)
+    while True:
+        t0 = time.perf_counter()
+        copy(primary, replica)
+        print(f"{primary} -> {replica} in {(time.perf_counter() - t0) * 1e3:.1f} ms")
+        if args.once:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+End-to-end load test: the FastAPI app driven in-process by simulated players.
+
+    python -m benchmarks.bench_e2e --concurrency 50 --games 1000
+    python -m benchmarks.bench_e2e --compare benchmarks/results/e2e-<old>.json
+
+Requests go through the bot's ApiClient over httpx.ASGITransport, so
+nothing listens on a port. The app's lifespan runs as in production, and
+the database is a fresh SQLite file. Flows:
+
+  rps     /api/users/sync x2 -> /game/create-room -> /game/rps/move x2 -> /game/end-rps-session
+  report  /api/games/report
+
+Prints throughput, p50/p95/p99 latency and SQL statements per request,
+per endpoint. The results are saved as JSON (with the git commit) under
+benchmarks/results/, so runs can be compared across commits.
+Set ASYNC_DB=1 to measure the async session path, EVENT_LOG_ENABLED=1 for
+write-behind settlement.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Statement counter of the request being made by the current task (copied into the threadpool)
+_queries = contextvars.ContextVar("bench_queries", default=None)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def call(self, api, name, method, path, **kwargs):
+        counter = [0]
+        token = _queries.set(counter)
+        t0 = time.perf_counter()
+        try:
+            res = await api.request(method, path, **kwargs)
+        finally:
+            _queries.reset(token)
+        self.latencies[name].append(time.perf_counter() - t0)
+        self.queries[name].append(counter[0])
+        if res.status_code != 200 or "error" in res.json():
+            self.errors[name] += 1
+        return res
+
+    def summary(self, elapsed: float):
+        endpoints = {}
+        for name, values in sorted(self.latencies.items()):
+            values = sorted(values)
+            endpoints[name] = {
+                "requests": len(values),
+                "errors": self.errors[name],
+                "rps": round(len(values) / elapsed, 1),
+                "p50_ms": round(percentile(values, 0.50) * 1e3, 2),
+                "p95_ms": round(percentile(values, 0.95) * 1e3, 2),
+                "p99_ms": round(percentile(values, 0.99) * 1e3, 2),
+                "queries_per_request": round(sum(self.queries[name]) / len(values), 2),
+            }
+        everything = sorted(v for values in self.latencies.values() for v in values)
+        total = {
+            "requests": len(everything),
+            "errors": sum(self.errors.values()),
+            "rps": round(len(everything) / elapsed, 1),
+            "p50_ms": round(percentile(everything, 0.50) * 1e3, 2),
+            "p95_ms": round(percentile(everything, 0.95) * 1e3, 2),
+            "p99_ms": round(percentile(everything, 0.99) * 1e3, 2),
+            "queries_per_request": round(
+                sum(sum(q) for q in self.queries.values()) / max(len(everything), 1), 2
+            ),
+        }
+        return total, endpoints
+
+
+async def rps_flow(api, rec: Recorder, game: int):
+    p1, p2 = 1_000_000 + 2 * game, 1_000_001 + 2 * game
+    for player in (p1, p2):
+        await rec.call(api, "users/sync", "POST", "/api/users/sync",
+                       json={"telegram_id": player, "username": f"bench{player}"})
+    res = await rec.call(api, "create-room", "POST", "/game/create-room",
+                         json={"game_type": "rps", "telegram_id": p1})
+    room_code = res.json()["room_code"]
+    await rec.call(api, "rps/move", "POST", "/game/rps/move",
+                   json={"room_code": room_code, "telegram_id": p1, "move": "rock"})
+    await rec.call(api, "rps/move", "POST", "/game/rps/move",
+                   json={"room_code": room_code, "telegram_id": p2, "move": "scissors"})
+    await rec.call(api, "end-rps-session", "POST", "/game/end-rps-session", params={"room_code": room_code})
+
+
+async def report_flow(api, rec: Recorder, game: int):
+    p1, p2 = 2_000_000 + 2 * (game % 5000), 2_000_001 + 2 * (game % 5000)
+    await rec.call(api, "games/report", "POST", "/api/games/report", json={
+        "game_type": "rps", "room_code": f"BENCH{game}", "duration_seconds": 30,
+        "players": [{"telegram_id": p1, "result": "win", "score": 1}, {"telegram_id": p2, "result": "loss"}],
+    })
+
+
+FLOWS = {"rps": rps_flow, "report": report_flow}
+
+
+async def run(args):
+    import httpx
+    from sqlalchemy import event
+
+    from app import database
+    from app.main import app
+    from bot.api_client import ApiClient
+
+    database.Base.metadata.create_all(database.engine)
+
+    def count(*_):
+        counter = _queries.get()
+        if counter is not None:
+            counter[0] += 1
+
+    engine = database.async_engine.sync_engine if database.async_engine is not None else database.engine
+    event.listen(engine, "before_cursor_execute", count)
+
+    api = ApiClient(base_url="http://bench", pool_size=args.concurrency, transport=httpx.ASGITransport(app=app))
+    results = {}
+    async with app.router.lifespan_context(app):
+        await api.post("/game/add-game-types")
+        for flow in args.flows:
+            rec = Recorder()
+            games = iter(range(args.games))
+
+            async def player():
+                for game in games:
+                    await FLOWS[flow](api, rec, game)
+
+            t0 = time.perf_counter()
+            await asyncio.gather(*(player() for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - t0
+            total, endpoints = rec.summary(elapsed)
+            results[flow] = {
+                "games": args.games, "seconds": round(elapsed, 2),
+                "games_per_sec": round(args.games / elapsed, 1), "total": total, "endpoints": endpoints,
+            }
+    await api.aclose()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_results(results, baseline=None):
+    header = f"{'endpoint':<18}{'reqs':>7}{'err':>5}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'q/req':>7}"
+    for flow, r in results["flows"].items():
+        print(f"\n[{flow}] {r['games']} games in {r['seconds']}s ({r['games_per_sec']} games/s)")
+        print(header)
+        rows = list(r["endpoints"].items()) + [("TOTAL", r["total"])]
+        for name, e in rows:
+            line = (f"{name:<18}{e['requests']:>7}{e['errors']:>5}{e['rps']:>9}{e['p50_ms']:>9}"
+                    f"{e['p95_ms']:>9}{e['p99_ms']:>9}{e['queries_per_request']:>7}")
+            old = baseline and baseline["flows"].get(flow, {}).get("endpoints" if name != "TOTAL" else "total")
+            old = old and (old if name == "TOTAL" else old.get(name))
+            if old:
+                line += f"   p95 {e['p95_ms'] - old['p95_ms']:+.2f} ms, q/req {e['queries_per_request'] - old['queries_per_request']:+.2f}"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50, help="simulated players in flight")
+    parser.add_argument("--games", type=int, default=1000, help="flow runs per flow")
+    parser.add_argument("--flows", nargs="+", choices=list(FLOWS), default=list(FLOWS))
+    parser.add_argument("--json", help="result file (default benchmarks/results/e2e-<commit>-<time>.json)")
+    parser.add_argument("--compare", help="earlier result file to diff against")
+    args = parser.parse_args()
+
+    # The app reads its configuration at import time: point it at a scratch database first
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir}/bench.db"
+    os.environ.setdefault("ROOM_STORE_PATH", os.path.join(workdir, "room_state.db"))
+    os.environ.setdefault("EVENT_LOG_DIR", os.path.join(workdir, "event_log"))
+    os.environ.setdefault("ROOM_SWEEPER_ENABLED", "false")
+    os.environ.setdefault("MATCHMAKING_ENABLED", "false")
+    os.environ.setdefault("API_RETRIES", "0")
+
+    flows = asyncio.run(run(args))
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "config": {
+            "concurrency": args.concurrency, "games": args.games,
+            "async_db": os.getenv("ASYNC_DB", "false"), "room_store": os.getenv("ROOM_STORE", "memory"),
+            "db_profile": os.getenv("DB_PROFILE", "default"), "event_log": os.getenv("EVENT_LOG_ENABLED", "false"),
+        },
+        "flows": flows,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    out = args.json
+    if not out:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        out = os.path.join(RESULTS_DIR, f"e2e-{results['commit'] or 'nogit'}-{stamp}.json")
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nsaved {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Matchmaking queue at scale: enqueue, cancel and pairing cost with 100k queued players.
+
+    python -m benchmarks.bench_matchmaking --players 100000
+
+Ratings are drawn from N(1500, 300). Players are enqueued over --arrival
+seconds of simulated time, then the queue is paired in ticks of
+--tick seconds (MATCHMAKING_BATCH pairs per tick) until it is drained or
+only players no one can reach are left (their window stopped growing). Wait times are in simulated seconds, so the
+numbers reflect the window policy, not this machine's speed.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from app.services.matchmaking import MATCHMAKING_BATCH, MatchmakingQueue
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--players", type=int, default=100_000)
+    parser.add_argument("--arrival", type=float, default=60.0, help="simulated seconds over which players join")
+    parser.add_argument("--tick", type=float, default=0.5)
+    parser.add_argument("--batch", type=int, default=MATCHMAKING_BATCH)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ratings = [rng.gauss(1500, 300) for _ in range(args.players)]
+    arrivals = sorted(rng.uniform(0, args.arrival) for _ in range(args.players))
+    results = {"players": args.players}
+
+    # Raw operation cost on a queue holding all players
+    queue = MatchmakingQueue()
+    t0 = time.perf_counter()
+    for i, rating in enumerate(ratings):
+        queue.add(i, rating, now=0.0)
+    results["enqueue_us"] = round((time.perf_counter() - t0) / args.players * 1e6, 2)
+    sample = rng.sample(range(args.players), min(10_000, args.players))
+    t0 = time.perf_counter()
+    for i in sample:
+        queue.remove(i)
+    results["cancel_us"] = round((time.perf_counter() - t0) / len(sample) * 1e6, 2)
+    for i in sample:
+        queue.add(i, ratings[i], now=0.0)
+    t0 = time.perf_counter()
+    pairs = queue.pair(now=0.0, limit=args.batch)
+    results["first_tick_ms"] = round((time.perf_counter() - t0) * 1e3, 2)
+    results["first_tick_pairs"] = len(pairs)
+
+    # Simulated arrivals and ticks
+    queue = MatchmakingQueue()
+    waits, diffs, pair_seconds = [], [], 0.0
+    now, i, ticks, idle = 0.0, 0, 0, 0.0
+    # Past this much time without a pair, every window left is at its maximum
+    settle = (queue.max_window - queue.base_window) / queue.widen_rate + args.tick
+    while i < args.players or (len(queue) and idle <= settle):
+        now += args.tick
+        ticks += 1
+        while i < args.players and arrivals[i] <= now:
+            queue.add(i, ratings[i], now=arrivals[i])
+            i += 1
+        t0 = time.perf_counter()
+        pairs = queue.pair(now=now, limit=args.batch)
+        pair_seconds += time.perf_counter() - t0
+        idle = 0.0 if pairs else idle + args.tick
+        for a, b in pairs:
+            waits += [now - a.enqueued_at, now - b.enqueued_at]
+            diffs.append(abs(a.rating - b.rating))
+
+    matched = len(diffs) * 2
+    results.update({
+        "ticks": ticks,
+        "matched_players": matched,
+        "left_in_queue": len(queue),
+        "pair_us_per_match": round(pair_seconds / max(len(diffs), 1) * 1e6, 2),
+        "pair_ms_per_tick": round(pair_seconds / ticks * 1e3, 3),
+        "wait_p50_s": round(percentile(waits, 0.5), 3) if waits else None,
+        "wait_p95_s": round(percentile(waits, 0.95), 3) if waits else None,
+        "wait_p99_s": round(percentile(waits, 0.99), 3) if waits else None,
+        "rating_diff_mean": round(statistics.mean(diffs), 1) if diffs else None,
+        "rating_diff_p99": round(percentile(diffs, 0.99), 1) if diffs else None,
+    })
+    for key, value in results.items():
+        print(f"{key:>20}: {value}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
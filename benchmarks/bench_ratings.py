@@ -0,0 +1,75 @@
+"""
+Full-history rating replay: NumPy batched vs. a per-match Python loop.
+
+    python -m benchmarks.bench_ratings --matches 10000000 --players 100000
+
+Synthetic 1v1 history (uniform random pairings). Both replays must end
+with the same ratings; the database read/write of the real tool
+(python -m app.tools.recompute_ratings) is not included.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.services.ratings import RATING_INITIAL, apply_elo
+from app.tools.recompute_ratings import replay, schedule
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--matches", type=int, default=1_000_000)
+    parser.add_argument("--players", type=int, default=100_000)
+    parser.add_argument("--python-matches", type=int, default=1_000_000,
+                        help="matches replayed by the Python loop (it is extrapolated past this)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    a = rng.integers(0, args.players, args.matches)
+    b = (a + rng.integers(1, args.players, args.matches)) % args.players
+    score = rng.choice([0.0, 0.5, 1.0], args.matches)
+
+    t0 = time.perf_counter()
+    batches = schedule(a, b, args.players)
+    schedule_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    ratings = replay(a, b, score, args.players)
+    numpy_s = time.perf_counter() - t0
+
+    n = min(args.python_matches, args.matches)
+    matches = list(zip(a[:n].tolist(), b[:n].tolist(), score[:n].tolist()))
+    t0 = time.perf_counter()
+    reference = apply_elo({}, matches)
+    python_s = (time.perf_counter() - t0) * args.matches / n
+
+    if n == args.matches:
+        expected = np.full(args.players, RATING_INITIAL)
+        for player, rating in reference.items():
+            expected[player] = rating
+        max_diff = float(np.abs(expected - ratings).max())
+    else:
+        max_diff = None
+
+    results = {
+        "matches": args.matches,
+        "players": args.players,
+        "batches": int(batches.max()) + 1,
+        "numpy_seconds": round(numpy_s, 2),
+        "numpy_schedule_seconds": round(schedule_s, 2),
+        "python_seconds": round(python_s, 2),
+        "python_extrapolated": n < args.matches,
+        "speedup": round(python_s / numpy_s, 1),
+        "max_rating_diff": max_diff,
+    }
+    for key, value in results.items():
+        print(f"{key:>24}: {value}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Room code allocation: the old random-retry loop vs. RoomCodeAllocator.
+
+    python -m benchmarks.bench_room_codes --sizes 10000 1000000 10000000 --codes 2000
+
+Each size gets its own SQLite file pre-filled with that many random room codes.
+The legacy loop probes game_rooms once per candidate code; the allocator
+only touches the database to reserve a counter block.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import Base
+from app.services.room_codes import ALPHABET, CODE_LENGTH, RoomCodeAllocator
+
+
+def fill_rooms(path: str, n: int):
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO game_types (id, name) VALUES (1, 'rps')")
+    chunk = 100_000
+    for start in range(0, n, chunk):
+        conn.executemany(
+            "INSERT OR IGNORE INTO game_rooms (code, game_type_id, is_active) VALUES (?, 1, 0)",
+            ((''.join(random.choices(ALPHABET, k=CODE_LENGTH)),) for _ in range(min(chunk, n - start))),
+        )
+    conn.commit()
+    conn.close()
+
+
+def legacy_code(db):
+    # The loop create_game_room used before the allocator
+    probes = 0
+    while True:
+        code = ''.join(random.choices(ALPHABET, k=CODE_LENGTH))
+        probes += 1
+        if not db.query(models.GameRoom).filter_by(code=code).first():
+            return code, probes
+
+
+def run(size: int, codes: int, block_size: int, workdir: str):
+    path = os.path.join(workdir, f"rooms_{size}.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    t0 = time.perf_counter()
+    fill_rooms(path, size)
+    fill_seconds = time.perf_counter() - t0
+
+    queries = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(*_):
+        queries[0] += 1
+
+    Session = sessionmaker(bind=engine)
+    result = {"existing_rooms": size, "codes": codes, "fill_seconds": round(fill_seconds, 1)}
+    with Session() as db:
+        queries[0] = 0
+        probes = 0
+        t0 = time.perf_counter()
+        for _ in range(codes):
+            probes += legacy_code(db)[1]
+        elapsed = time.perf_counter() - t0
+        result["legacy"] = {
+            "us_per_code": round(elapsed / codes * 1e6, 2),
+            "probes_per_code": round(probes / codes, 4),
+            "queries_per_code": round(queries[0] / codes, 4),
+        }
+
+        allocator = RoomCodeAllocator(block_size=block_size)
+        queries[0] = 0
+        t0 = time.perf_counter()
+        for _ in range(codes):
+            allocator.next_code(db)
+        elapsed = time.perf_counter() - t0
+        result["allocator"] = {
+            "us_per_code": round(elapsed / codes * 1e6, 2),
+            "queries_per_code": round(queries[0] / codes, 4),
+        }
+    engine.dispose()
+    os.remove(path)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--codes", type=int, default=2000, help="codes generated per method and size")
+    parser.add_argument("--block-size", type=int, default=1000)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            r = run(size, args.codes, args.block_size, workdir)
+            results.append(r)
+            print(
+                f"{size:>11,} rooms | legacy {r['legacy']['us_per_code']:>8.1f} us/code, "
+                f"{r['legacy']['queries_per_code']:.3f} queries/code | "
+                f"allocator {r['allocator']['us_per_code']:>6.1f} us/code, "
+                f"{r['allocator']['queries_per_code']:.4f} queries/code"
+            )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Concurrent SQLite write throughput per DB_PROFILE ("default" vs "production").
+
+    python -m benchmarks.bench_sqlite_writes --writers 8 --readers 4 --seconds 5
+
+Each profile gets a fresh database file. Writer processes settle reported
+1v1 games, one transaction each, through the same record_reports path that
+/api/games/report runs. Reader processes page the leaderboard through the
+read-only engine at the same time. Processes rather than threads, as with
+uvicorn workers: the lock contention measured is SQLite's, not the GIL's.
+The benchmark counts committed reports, "database is locked" failures and
+leaderboard reads.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app import schemas
+from app.database import DB_PROFILES, Base, make_engine
+from app.services import stats
+from app.services.settlement import record_reports
+
+
+def report(rng: random.Random, players: int) -> schemas.GameReport:
+    a, b = rng.sample(range(1, players + 1), 2)
+    return schemas.GameReport(
+        game_type="rps", room_code=f"R{rng.getrandbits(40):x}", duration_seconds=30,
+        players=[schemas.GameResultPlayer(telegram_id=a, result="win", score=1),
+                 schemas.GameResultPlayer(telegram_id=b, result="loss")],
+    )
+
+
+def worker(role: str, profile: str, url: str, start: float, seconds: float, players: int, seed: int):
+    """One writer or reader process (like one uvicorn worker): runs from start to start + seconds."""
+    engine = make_engine(url, profile=profile, readonly=role == "reader")
+    Session = sessionmaker(bind=engine)
+    rng = random.Random(seed)
+    counts = {"ok": 0, "locked": 0}
+    latencies = []
+    time.sleep(max(0.0, start - time.time()))
+    stop = start + seconds
+    while time.time() < stop:
+        t0 = time.perf_counter()
+        with Session() as db:
+            try:
+                if role == "writer":
+                    record_reports(db, [report(rng, players)])
+                else:
+                    stats.get_leaderboard(db, "rps", 50, None, "wins")
+            except OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                counts["locked"] += 1
+                continue
+        counts["ok"] += 1
+        latencies.append(time.perf_counter() - t0)
+    engine.dispose()
+    return role, counts, latencies
+
+
+def run(profile: str, writers: int, readers: int, seconds: float, players: int, workdir: str):
+    url = f"sqlite:///{os.path.join(workdir, profile + '.db')}"
+    engine = make_engine(url, profile=profile)
+    Base.metadata.create_all(engine)
+    # Warm up: the leaderboard has rows to page through from the start
+    with sessionmaker(bind=engine)() as db:
+        rng = random.Random(0)
+        record_reports(db, [report(rng, players) for _ in range(players)])
+    engine.dispose()
+
+    roles = ["writer"] * writers + ["reader"] * readers
+    start = time.time() + 1.0  # let every process start and connect first
+    with ProcessPoolExecutor(len(roles)) as pool:
+        futures = [pool.submit(worker, role, profile, url, start, seconds, players, i) for i, role in enumerate(roles)]
+        done = [f.result() for f in futures]
+
+    totals = {role: {"ok": 0, "locked": 0, "latencies": []} for role in ("writer", "reader")}
+    for role, counts, latencies in done:
+        totals[role]["ok"] += counts["ok"]
+        totals[role]["locked"] += counts["locked"]
+        totals[role]["latencies"] += latencies
+    commits = sorted(totals["writer"]["latencies"])
+    return {
+        "commits": totals["writer"]["ok"],
+        "locked": totals["writer"]["locked"],
+        "reads": totals["reader"]["ok"],
+        "read_errors": totals["reader"]["locked"],
+        "commits_per_sec": round(totals["writer"]["ok"] / seconds, 1),
+        "reads_per_sec": round(totals["reader"]["ok"] / seconds, 1),
+        "commit_p50_ms": round(commits[len(commits) // 2] * 1e3, 2) if commits else None,
+        "commit_p99_ms": round(commits[int(len(commits) * 0.99)] * 1e3, 2) if commits else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--profiles", nargs="+", choices=list(DB_PROFILES), default=list(DB_PROFILES))
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_sqlite_")
+    results = {}
+    for profile in args.profiles:
+        r = results[profile] = run(profile, args.writers, args.readers, args.seconds, args.players, workdir)
+        print(f"{profile:>10} | {r['commits_per_sec']:>8} commits/s | p50 {r['commit_p50_ms']} ms "
+              f"p99 {r['commit_p99_ms']} ms | locked {r['locked']:>4} | {r['reads_per_sec']:>8} reads/s "
+              f"(errors {r['read_errors']})")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
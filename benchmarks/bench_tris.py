@@ -0,0 +1,163 @@
+"""
+Tris move throughput: bitboard engine vs. a list-of-lists board.
+
+    python -m benchmarks.bench_tris --games 20000
+
+Both sides replay the same pre-drawn random games: validate the cell,
+play it, check for a winner. The engine is also measured through the
+room-state path (TrisEngine.validate_move / apply_move on the field dict),
+which is what /game/tris/move runs per request, and the AI opponent's
+table build and per-move lookup.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from app.game_engines import tris, tris_ai
+from app.game_engines.tris import TrisEngine
+
+
+def random_games(n: int, seed: int):
+    rng = random.Random(seed)
+    games = []
+    for _ in range(n):
+        board, moves = 0, []
+        while not tris.is_terminal(board):
+            x, o = tris.unpack(board)
+            cell = rng.choice([i for i in range(tris.CELLS) if not (x | o) >> i & 1])
+            moves.append(cell)
+            board = tris.play(board, cell)
+        games.append(moves)
+    return games
+
+
+# Reference implementation: 3x3 nested lists, winner found by scanning the lines
+LINES = [[(r, c) for c in range(3)] for r in range(3)] + \
+        [[(r, c) for r in range(3)] for c in range(3)] + \
+        [[(i, i) for i in range(3)], [(i, 2 - i) for i in range(3)]]
+
+
+def list_winner(grid):
+    for line in LINES:
+        a, b, c = (grid[r][col] for r, col in line)
+        if a and a == b == c:
+            return a
+    return None
+
+
+def replay_lists(games):
+    moves = 0
+    for game in games:
+        grid = [[None] * 3 for _ in range(3)]
+        turn = "X"
+        for cell in game:
+            row, col = divmod(cell, 3)
+            if grid[row][col] is not None or list_winner(grid):
+                raise AssertionError("illegal move")
+            grid[row][col] = turn
+            turn = "O" if turn == "X" else "X"
+            list_winner(grid)
+            moves += 1
+    return moves
+
+
+def replay_bitboard(games):
+    moves = 0
+    for game in games:
+        board = 0
+        for cell in game:
+            if tris.validate_move(board, cell):
+                raise AssertionError("illegal move")
+            board = tris.play(board, cell)
+            tris.check_winner(board)
+            moves += 1
+    return moves
+
+
+def replay_engine(games):
+    engine = TrisEngine()
+    moves = 0
+    for game in games:
+        state = {}
+        for i, cell in enumerate(game):
+            player = i % 2 + 1
+            move = str(cell)
+            if engine.validate_move(state, player, move):
+                raise AssertionError("illegal move")
+            state = engine.apply_move(state, player, move)
+            engine.is_terminal(state)
+            moves += 1
+    return moves
+
+
+def _positions(game):
+    board = 0
+    for cell in game:
+        yield board
+        board = tris.play(board, cell)
+
+
+def measure(fn, games, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        moves = fn(games)
+        best = min(best, time.perf_counter() - t0)
+    return {"moves": moves, "moves_per_sec": round(moves / best), "ns_per_move": round(best / moves * 1e9)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5, help="best of N runs")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    games = random_games(args.games, args.seed)
+    results = {
+        "list_of_lists": measure(replay_lists, games, args.repeat),
+        "bitboard": measure(replay_bitboard, games, args.repeat),
+        "engine_state": measure(replay_engine, games, args.repeat),
+    }
+
+    # Size of one finished board as kept in the room store
+    grid = [["X", "O", "X"], ["X", "O", "O"], ["O", "X", "X"]]
+    state = {"board": str(tris.pack(0b110001101, 0b001110010)), "x": "123456789", "o": "987654321"}
+    results["state_bytes"] = {
+        "bitboard_int": sys.getsizeof(tris.pack(0b110001101, 0b001110010)),
+        "bitboard_json": len(json.dumps(state)),
+        "list_of_lists": sys.getsizeof(grid) + sum(sys.getsizeof(row) for row in grid),
+        "list_of_lists_json": len(json.dumps({"board": grid, "x": "123456789", "o": "987654321"})),
+    }
+
+    t0 = time.perf_counter()
+    table = tris_ai.TrisSolver().build_table()
+    build = time.perf_counter() - t0
+    tris_ai.load_or_build()
+    boards = [b for game in games[:1000] for b in _positions(game)]
+    t0 = time.perf_counter()
+    for board in boards:
+        tris_ai.ai_move(board)
+    results["ai"] = {
+        "positions": len(table),
+        "build_ms": round(build * 1e3, 1),
+        "us_per_move": round((time.perf_counter() - t0) / len(boards) * 1e6, 2),
+    }
+
+    base = results["list_of_lists"]["moves_per_sec"]
+    for name in ("list_of_lists", "bitboard", "engine_state"):
+        r = results[name]
+        print(f"{name:>14} | {r['moves_per_sec']:>10,} moves/s | {r['ns_per_move']:>6} ns/move | "
+              f"x{r['moves_per_sec'] / base:.2f}")
+    print("state bytes   |", results["state_bytes"])
+    print("ai            |", results["ai"])
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+
+# Pool / timeout / retry tuning
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "100"))
+API_KEEPALIVE = int(os.getenv("API_KEEPALIVE", "20"))
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "10"))
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "3"))
+API_RETRIES = int(os.getenv("API_RETRIES", "3"))
+API_BACKOFF = float(os.getenv("API_BACKOFF", "0.2"))
+# Event streams: the API sends a keepalive every ROOM_EVENTS_POLL seconds, so a longer silence means a dead stream
+API_EVENTS_READ_TIMEOUT = float(os.getenv("API_EVENTS_READ_TIMEOUT", "60"))
+# Open event streams at once: they have their own connections, so watched rooms never take the handlers' pool
+API_EVENTS_POOL_SIZE = int(os.getenv("API_EVENTS_POOL_SIZE", "500"))
+
+# Errors raised before the request reached the API: safe to retry for any method
+SAFE_RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# Only GETs are retried on these, since a POST may already have been applied
+IDEMPOTENT_RETRY_ERRORS = (httpx.ReadTimeout, httpx.RemoteProtocolError)
+IDEMPOTENT_RETRY_STATUSES = {502, 503, 504}
+
+# Read-your-writes pin set by the API on a committed write (app/database.py): kept per end user, never shared
+DB_PIN_COOKIE = "db_pin"
+
+
+class ApiClient:
+    """
+    Shared async client for the game API.
+    One instance lives in application.bot_data["api"], so every handler
+    reuses the same keep-alive connection pool instead of opening a socket per call.
+    Event streams, held open until their room ends, use a second client and pool.
+    Cookies are not kept: the API's read-your-writes pin is stored per user
+    and sent only with that user's calls (request(..., user=telegram_id)).
+    """
+
+    def __init__(self, base_url: str = API_URL, pool_size: int = API_POOL_SIZE,
+                 keepalive: int = API_KEEPALIVE, timeout: float = API_TIMEOUT,
+                 retries: int = API_RETRIES, backoff: float = API_BACKOFF,
+                 events_pool_size: int = API_EVENTS_POOL_SIZE,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.retries = retries
+        self.backoff = backoff
+        # telegram_id -> pinned until (epoch seconds), oldest first
+        self._pins: Dict[int, float] = {}
+        # transport: e.g. httpx.ASGITransport(app) to drive the API in-process (benchmarks)
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=keepalive),
+            timeout=httpx.Timeout(timeout, connect=API_CONNECT_TIMEOUT),
+            # A jar that accepts nothing: one user's pin must not follow every other user's calls
+            cookies=CookieJar(policy=DefaultCookiePolicy(allowed_domains=[])),
+            transport=transport,
+        )
+        # No pool timeout: past events_pool_size, a new stream waits for one to end
+        self._events_client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(max_connections=events_pool_size, max_keepalive_connections=0),
+            timeout=httpx.Timeout(timeout, connect=API_CONNECT_TIMEOUT, read=API_EVENTS_READ_TIMEOUT, pool=None),
+            transport=transport,
+        )
+
+    def _pin_headers(self, user: Optional[int], headers: Optional[dict]) -> Optional[dict]:
+        until = self._pins.get(user) if user is not None else None
+        if until is None or until <= time.time():
+            return headers
+        return {**(headers or {}), "Cookie": f"{DB_PIN_COOKIE}={until:.3f}"}
+
+    def _save_pin(self, user: Optional[int], res: httpx.Response):
+        pin = res.cookies.get(DB_PIN_COOKIE)
+        if user is None or pin is None:
+            return
+        self._pins.pop(user, None)
+        self._pins[user] = float(pin)
+        # Pins all last the same window: the expired ones are at the front
+        now = time.time()
+        while self._pins and next(iter(self._pins.values())) <= now:
+            del self._pins[next(iter(self._pins))]
+
+    async def request(self, method: str, path: str, user: Optional[int] = None, **kwargs) -> httpx.Response:
+        """user: telegram id the call is made for; its reads then see its own recent writes."""
+        idempotent = method.upper() == "GET"
+        kwargs["headers"] = self._pin_headers(user, kwargs.get("headers"))
+        attempt = 0
+        while True:
+            try:
+                res = await self._client.request(method, path, **kwargs)
+                if not (idempotent and res.status_code in IDEMPOTENT_RETRY_STATUSES and attempt < self.retries):
+                    self._save_pin(user, res)
+                    return res
+                logger.warning(f"{method} {path} returned {res.status_code}, retrying")
+            except SAFE_RETRY_ERRORS as e:
+                if attempt >= self.retries:
+                    raise
+                logger.warning(f"{method} {path} failed ({e!r}), retrying")
+            except IDEMPOTENT_RETRY_ERRORS as e:
+                if not idempotent or attempt >= self.retries:
+                    raise
+                logger.warning(f"{method} {path} failed ({e!r}), retrying")
+
+            # Exponential backoff: 0.2s, 0.4s, 0.8s, ...
+            await asyncio.sleep(self.backoff * (2 ** attempt))
+            attempt += 1
+
+    async def get(self, path: str, user: Optional[int] = None, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, user, **kwargs)
+
+    async def post(self, path: str, user: Optional[int] = None, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, user, **kwargs)
+
+    async def events(self, path: str, **kwargs):
+        """Server-sent events from path, yielded as their parsed JSON data. Not retried."""
+        async with self._events_client.stream("GET", path, **kwargs) as res:
+            res.raise_for_status()
+            async for line in res.aiter_lines():
+                if line.startswith("data:"):
+                    yield json.loads(line[5:])
+
+    async def aclose(self):
+        await self._client.aclose()
+        await self._events_client.aclose()
@@ -1,14 +1,51 @@
-from telegram.ext import ApplicationBuilder
-from handlers.start import start_handler
-from handlers.game import game_handlers
-
 import os
 from dotenv import load_dotenv
 
+# Load .env before the handler modules read API_URL / pool settings
 load_dotenv()
+
+from telegram.ext import ApplicationBuilder
+from handlers.start import start_handler
+from handlers.game import game_handlers
+from api_client import ApiClient
+from outbox import Outbox
+from update_processor import PerChatUpdateProcessor
+import metrics
+
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
-app = ApplicationBuilder().token(BOT_TOKEN).build()
+
+# Shared API client, created once for all handlers; replies and room results
+# go through the outbox (rate limited, coalesced per chat)
+async def on_startup(application):
+    application.bot_data["api"] = ApiClient()
+    outbox = application.bot_data["outbox"] = Outbox(application.bot)
+    outbox.start()
+    application.bot_data["metrics_server"] = await metrics.start_server()
+
+
+# post_stop runs before the bot is shut down: pending messages can still be sent
+async def on_stop(application):
+    await application.bot_data["outbox"].stop()
+    server = application.bot_data["metrics_server"]
+    if server is not None:
+        server.close()
+
+
+async def close_api_client(application):
+    await application.bot_data["api"].aclose()
+
+
+app = (
+    ApplicationBuilder()
+    .token(BOT_TOKEN)
+    # Chats are handled concurrently, each chat's updates in order
+    .concurrent_updates(PerChatUpdateProcessor())
+    .post_init(on_startup)
+    .post_stop(on_stop)
+    .post_shutdown(close_api_client)
+    .build()
+)
 
 app.add_handler(start_handler)
 app.add_handlers(game_handlers)
@@ -1,27 +1,31 @@
-import os
-import requests
+import logging
+
 from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler
 from fastapi import HTTPException
+from outbox import reply
+from room_watcher import watch_room
 
-API_URL = os.getenv("API_URL", "http://localhost:8000")
+logger = logging.getLogger(__name__)
 
 # /health
 async def health_check(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        res = requests.get(f"{API_URL}/game/health")
+        res = await context.bot_data["api"].get("/game/health")
         data = res.json()
-        await update.message.reply_text(f"✅ API Status: {data['status']}")
+        reply(update, context, f"✅ API Status: {data['status']}")
     except Exception as e:
-        await update.message.reply_text(f"⚠️ API Error: {e}")
+        logger.exception("/health failed")
+        reply(update, context, f"⚠️ API Error: {e}")
 
 # /add_rps
 async def add_rps_game_type(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        res = requests.post(f"{API_URL}/game/add-rps-game-type")
-        await update.message.reply_text(res.json().get("message", "Unknown response"))
+        res = await context.bot_data["api"].post("/game/add-rps-game-type")
+        reply(update, context, res.json().get("message", "Unknown response"))
     except Exception as e:
-        await update.message.reply_text(f"⚠️ Error: {e}")
+        logger.exception("Command failed")
+        reply(update, context, f"⚠️ Error: {e}")
 
 # /create_room
 async def create_game_room(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -30,25 +34,24 @@ async def create_game_room(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "game_type": "rps",
         "telegram_id": user.id  # Ensure you're using the correct user ID (could be telegram_id or custom user_id)
     }
-    
-    print(user.id)
 
     try:
-        res = requests.post(f"{API_URL}/game/create-room", json=payload)
+        res = await context.bot_data["api"].post("/game/create-room", user.id, json=payload)
         if res.status_code == 200:
             room_code = res.json().get("room_code")
-            await update.message.reply_text(f"✅ Room created! Room code: {room_code}")
+            watch_room(context.application, room_code)
+            reply(update, context, f"✅ Room created! Room code: {room_code}")
         else:
-            await update.message.reply_text("❌ Error creating room.")
+            reply(update, context, "❌ Error creating room.")
     except Exception as e:
-        await update.message.reply_text("⚠️ Server error.")
-        print("Error:", e)
+        reply(update, context, "⚠️ Server error.")
+        logger.exception(f"/create_room failed for {user.id}")
         
 # /play <ROOM_CODE> <MOVE>
 async def play_rps_move(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         if len(context.args) != 2:
-            await update.message.reply_text("Usage: /play <ROOM_CODE> <MOVE>")
+            reply(update, context, "Usage: /play <ROOM_CODE> <MOVE>")
             return
 
         room_code, move = context.args
@@ -58,40 +61,44 @@ async def play_rps_move(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "move": move.lower()
         }
 
-        res = requests.post(f"{API_URL}/game/rps/move", json=payload)
+        res = await context.bot_data["api"].post("/game/rps/move", update.effective_user.id, json=payload)
 
         if res.status_code != 200:
-            await update.message.reply_text(f"❌ Error: {res.json().get('detail', 'Unknown error')}")
+            reply(update, context, f"❌ Error: {res.json().get('detail', 'Unknown error')}")
         else:
+            # The last move settles the room: the watcher messages both players with the result
+            watch_room(context.application, room_code)
             res_data = res.json()
-            await update.message.reply_text(res_data.get("status", "✅ Move submitted"))
+            reply(update, context, res_data.get("status", "✅ Move submitted"))
 
     except Exception as e:
-        await update.message.reply_text(f"⚠️ Error: {e}")
+        logger.exception("Command failed")
+        reply(update, context, f"⚠️ Error: {e}")
 
 
-# /end_session <ROOM_CODE>
+# /end_session <ROOM_CODE> (results are pushed when the last move lands; this shows them again)
 async def end_rps_session(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         if not context.args:
-            await update.message.reply_text("Usage: /end_session <ROOM_CODE>")
+            reply(update, context, "Usage: /end_session <ROOM_CODE>")
             return
 
         room_code = context.args[0]
-        res = requests.post(f"{API_URL}/game/end-rps-session", params={"room_code": room_code})
+        res = await context.bot_data["api"].post("/game/end-rps-session", update.effective_user.id, params={"room_code": room_code})
         data = res.json()
         if "message" in data:
             result = data.get("result", {})
-            await update.message.reply_text(
+            reply(update, context, 
                 f"✅ {data['message']}\n"
                 f"👤 Player 1: {data['player_1']} played {data['move_1']}\n"
                 f"👤 Player 2: {data['player_2']} played {data['move_2']}\n"
                 f"🏆 Result: {result.get('result', 'N/A')}"
             )
         else:
-            await update.message.reply_text(f"❌ Error: {data.get('error', 'Unknown')}")
+            reply(update, context, f"❌ Error: {data.get('error', 'Unknown')}")
     except Exception as e:
-        await update.message.reply_text(f"⚠️ Error: {e}")
+        logger.exception("Command failed")
+        reply(update, context, f"⚠️ Error: {e}")
 
 # Register command handlers
 game_handlers = [
@@ -1,9 +1,11 @@
+import logging
+
 from telegram import Update
 from telegram.ext import CommandHandler, ContextTypes
-import requests
-import os
+from outbox import reply
+from sync_cache import synced_users
 
-API_URL = os.getenv("API_URL", "http://localhost:8000")
+logger = logging.getLogger(__name__)
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.effective_user
@@ -12,14 +14,20 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "username": user.username or "unknown"
     }
 
+    # Same user, same username as the last successful sync: nothing to send
+    if synced_users.is_synced(user.id, payload["username"]):
+        reply(update, context, "✅ Registered successfully!")
+        return
+
     try:
-        res = requests.post(f"{API_URL}/api/users/sync", json=payload)
-        if res.status_code == 200:
-            await update.message.reply_text("✅ Registered successfully!")
+        res = await context.bot_data["api"].post("/api/users/sync", user.id, json=payload)
+        if res.status_code == 200 and res.json().get("status") == "synced":
+            synced_users.add(user.id, payload["username"])
+            reply(update, context, "✅ Registered successfully!")
         else:
-            await update.message.reply_text("❌ Error registering.")
+            reply(update, context, "❌ Error registering.")
     except Exception as e:
-        await update.message.reply_text("⚠️ Server error.")
-        print("Error:", e)
+        reply(update, context, "⚠️ Server error.")
+        logger.exception(f"/start failed for {user.id}")
 
 start_handler = CommandHandler("start", start)
@@ -0,0 +1,209 @@
+import asyncio
+import heapq
+import logging
+import os
+import time
+from collections import deque
+from datetime import timedelta
+from typing import Deque, Dict, List, Set, Tuple
+
+from telegram.error import RetryAfter, TelegramError
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Telegram allows ~30 messages/s per bot and ~1 message/s per chat (bursts are tolerated)
+OUTBOX_GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", "30"))
+OUTBOX_GLOBAL_BURST = int(os.getenv("OUTBOX_GLOBAL_BURST", "30"))
+OUTBOX_CHAT_RATE = float(os.getenv("OUTBOX_CHAT_RATE", "1"))
+OUTBOX_CHAT_BURST = int(os.getenv("OUTBOX_CHAT_BURST", "3"))
+OUTBOX_MAX_INFLIGHT = int(os.getenv("OUTBOX_MAX_INFLIGHT", "16"))
+# Seconds given to pending messages on shutdown
+OUTBOX_DRAIN_TIMEOUT = float(os.getenv("OUTBOX_DRAIN_TIMEOUT", "5"))
+
+MAX_MESSAGE_LENGTH = 4096
+COALESCE_SEPARATOR = "\n\n"
+
+queue_depth = metrics.Gauge("bot_outbox_queue_depth", "Messages waiting to be sent")
+pending_chats = metrics.Gauge("bot_outbox_pending_chats", "Chats with messages waiting to be sent")
+messages_total = metrics.Counter(
+    "bot_outbox_messages_total", "Queued messages by outcome (coalesced: merged into another send)", ["result"]
+)
+retry_after_total = metrics.Counter("bot_outbox_retry_after_total", "Sends refused by Telegram flood control")
+send_latency = metrics.Histogram("bot_outbox_send_latency_seconds", "Time from queueing a message to Telegram accepting it")
+send_seconds = metrics.Histogram("bot_outbox_send_seconds", "Duration of the sendMessage call")
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self, now: float) -> float:
+        """Seconds until a token is available (0: now)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class Outbox:
+    """
+    Outbound message queue. send() only queues; one scheduler task sends
+    under a global and a per-chat token bucket. Messages still queued for a
+    chat when its turn comes are merged into one message (up to Telegram's
+    4096 characters), so a burst of replies costs one send instead of many.
+    Order is kept per chat: a chat has at most one send in flight.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        now = time.monotonic()
+        self._global = TokenBucket(OUTBOX_GLOBAL_RATE, OUTBOX_GLOBAL_BURST, now)
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._pending: Dict[int, Deque[Tuple[str, float]]] = {}
+        # Every chat with pending messages is in exactly one of: ready, delayed, in flight
+        self._ready: Deque[int] = deque()
+        self._delayed: List[Tuple[float, int]] = []
+        self._active: Set[int] = set()
+        self._inflight: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._last_prune = now
+
+    def send(self, chat_id: int, text: str):
+        self._pending.setdefault(chat_id, deque()).append((text, time.monotonic()))
+        queue_depth.inc()
+        if chat_id not in self._active:
+            self._active.add(chat_id)
+            pending_chats.inc()
+            self._ready.append(chat_id)
+            self._wakeup.set()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        deadline = time.monotonic() + OUTBOX_DRAIN_TIMEOUT
+        while self._active and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._active:
+            logger.warning(f"Outbox stopped with {sum(map(len, self._pending.values()))} messages unsent")
+        self._task.cancel()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    def _take_batch(self, chat_id: int) -> Tuple[str, List[float]]:
+        pending = self._pending[chat_id]
+        text, queued_at = pending.popleft()
+        texts, times = [text], [queued_at]
+        length = len(text)
+        while pending and length + len(COALESCE_SEPARATOR) + len(pending[0][0]) <= MAX_MESSAGE_LENGTH:
+            text, queued_at = pending.popleft()
+            texts.append(text)
+            times.append(queued_at)
+            length += len(COALESCE_SEPARATOR) + len(text)
+        if not pending:
+            del self._pending[chat_id]
+        queue_depth.dec(len(texts))
+        return COALESCE_SEPARATOR.join(texts), times
+
+    def _requeue(self, chat_id: int, text: str, times: List[float]):
+        # Flood control: the merged text goes back to the front, sent as one message later
+        self._pending.setdefault(chat_id, deque()).appendleft((text, times[0]))
+        queue_depth.inc()
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                self._ready.append(heapq.heappop(self._delayed)[1])
+            timeout = self._delayed[0][0] - now if self._delayed else None
+
+            while self._ready and len(self._inflight) < OUTBOX_MAX_INFLIGHT:
+                chat_id = self._ready[0]
+                bucket = self._buckets.get(chat_id)
+                if bucket is None:
+                    bucket = self._buckets[chat_id] = TokenBucket(OUTBOX_CHAT_RATE, OUTBOX_CHAT_BURST, now)
+                chat_wait = bucket.wait(now)
+                if chat_wait:
+                    self._ready.popleft()
+                    heapq.heappush(self._delayed, (now + chat_wait, chat_id))
+                    timeout = min(timeout, chat_wait) if timeout is not None else chat_wait
+                    continue
+                global_wait = self._global.wait(now)
+                if global_wait:
+                    timeout = min(timeout, global_wait) if timeout is not None else global_wait
+                    break
+                self._ready.popleft()
+                bucket.take()
+                self._global.take()
+                text, times = self._take_batch(chat_id)
+                task = asyncio.create_task(self._send(chat_id, text, times))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+
+            if now - self._last_prune > 60:
+                self._prune(now)
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _send(self, chat_id: int, text: str, times: List[float]):
+        retry_at = None
+        started = time.monotonic()
+        try:
+            await self.bot.send_message(chat_id=chat_id, text=text)
+            sent = time.monotonic()
+            send_seconds.observe(sent - started)
+            for queued_at in times:
+                send_latency.observe(sent - queued_at)
+            messages_total.inc(result="sent")
+            if len(times) > 1:
+                messages_total.inc(len(times) - 1, result="coalesced")
+        except RetryAfter as e:
+            retry_after_total.inc()
+            delay = e.retry_after
+            delay = delay.total_seconds() if isinstance(delay, timedelta) else delay
+            logger.warning(f"Flood control on chat {chat_id}: retrying in {delay}s")
+            self._requeue(chat_id, text, times)
+            retry_at = time.monotonic() + delay
+        except TelegramError as e:
+            # e.g. a user who never opened a chat with the bot
+            messages_total.inc(len(times), result="failed")
+            logger.info(f"Could not message {chat_id}: {e}")
+        finally:
+            if retry_at is not None:
+                heapq.heappush(self._delayed, (retry_at, chat_id))
+            elif chat_id in self._pending:
+                self._ready.append(chat_id)
+            else:
+                self._active.discard(chat_id)
+                pending_chats.dec()
+            self._wakeup.set()
+
+    def _prune(self, now: float):
+        # Buckets back at full burst behave like new ones: drop them
+        for chat_id in [c for c, b in self._buckets.items() if c not in self._active and b.full(now)]:
+            del self._buckets[chat_id]
+        self._last_prune = now
+
+
+def reply(update, context, text: str):
+    """Queue text for the chat of update (replaces awaiting update.message.reply_text)."""
+    context.bot_data["outbox"].send(update.effective_chat.id, text)
@@ -0,0 +1,62 @@
+import asyncio
+import logging
+import os
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Reconnects of a room stream dropped before its result arrived
+ROOM_WATCH_RETRIES = int(os.getenv("ROOM_WATCH_RETRIES", "5"))
+
+RESULT_TEXT = {"win": "🏆 You won!", "loss": "😞 You lost.", "draw": "🤝 Draw."}
+
+
+def watch_room(application, room_code: str):
+    """
+    Listen for the result of room_code and message both players when it arrives.
+    One listener per room: calling it again for a watched room does nothing.
+    """
+    watchers = application.bot_data.setdefault("room_watchers", {})
+    if room_code in watchers:
+        return
+    task = application.create_task(_watch(application, room_code))
+    watchers[room_code] = task
+    task.add_done_callback(lambda _: watchers.pop(room_code, None))
+
+
+async def _watch(application, room_code: str):
+    api = application.bot_data["api"]
+    for attempt in range(ROOM_WATCH_RETRIES + 1):
+        try:
+            async for event in api.events(f"/game/rooms/{room_code}/events"):
+                if event["type"] == "result":
+                    _announce(application, event)
+                    return
+                if event["type"] == "expired":
+                    return
+        except httpx.HTTPStatusError as e:
+            # Unknown or closed room: nothing will ever be pushed
+            logger.warning(f"Room {room_code} events: {e.response.status_code}")
+            return
+        except httpx.TransportError as e:
+            logger.warning(f"Room {room_code} events stream dropped ({e!r})")
+        await asyncio.sleep(min(2 ** attempt, 30))
+    logger.error(f"Gave up watching room {room_code}")
+
+
+def _details(state: dict) -> str:
+    if "moves" in state:
+        return "\n".join(f"👤 {player} played {move}" for player, move in state["moves"])
+    if "board" in state:
+        board = state["board"]
+        return "\n".join(" ".join(board[row * 3:row * 3 + 3]) for row in range(3))
+    return ""
+
+
+def _announce(application, event: dict):
+    details = _details(event.get("state", {}))
+    outbox = application.bot_data["outbox"]
+    for player, outcome in event["outcome"].items():
+        # Private chats share the user's telegram id; the outbox logs players it cannot reach (e.g. the AI)
+        outbox.send(int(player), f"{RESULT_TEXT.get(outcome, outcome)} Room {event['room_code']}\n{details}")
@@ -0,0 +1,40 @@
+import os
+import time
+from collections import OrderedDict
+
+import metrics
+
+# Users already synced with the API: /start again with the same username skips POST /api/users/sync.
+# The TTL bounds how long a user deleted on the API side stays "synced" here.
+USER_SYNC_CACHE_SIZE = int(os.getenv("USER_SYNC_CACHE_SIZE", "100000"))
+USER_SYNC_CACHE_TTL = float(os.getenv("USER_SYNC_CACHE_TTL", "3600"))
+
+lookups = metrics.Counter("bot_user_sync_cache_total", "/start syncs by cache outcome (hit: no API call)", ["result"])
+
+
+class SyncedUsers:
+    """Bounded LRU of telegram_id -> (expires_at, username) last synced."""
+
+    def __init__(self, maxsize: int = USER_SYNC_CACHE_SIZE, ttl: float = USER_SYNC_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[int, tuple]" = OrderedDict()
+
+    def is_synced(self, telegram_id: int, username: str) -> bool:
+        entry = self._data.get(telegram_id)
+        hit = entry is not None and entry[0] >= time.monotonic() and entry[1] == username
+        if hit:
+            self._data.move_to_end(telegram_id)
+        elif entry is not None:
+            del self._data[telegram_id]
+        lookups.inc(result="hit" if hit else "miss")
+        return hit
+
+    def add(self, telegram_id: int, username: str):
+        self._data[telegram_id] = (time.monotonic() + self.ttl, username)
+        self._data.move_to_end(telegram_id)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+synced_users = SyncedUsers()
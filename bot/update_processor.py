@@ -0,0 +1,60 @@
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Dict
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+import metrics
+
+# Updates handled at the same time (across chats); one chat's updates still run one at a time, in order
+BOT_CONCURRENT_UPDATES = int(os.getenv("BOT_CONCURRENT_UPDATES", "64"))
+
+updates_in_progress = metrics.Gauge("bot_updates_in_progress", "Updates being handled or waiting for their chat")
+update_seconds = metrics.Histogram("bot_update_seconds", "Update handling time, chat wait included")
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Concurrent update processing with per-chat ordering: updates of different
+    chats run in parallel (up to max_concurrent_updates), updates of the same
+    chat wait for each other in arrival order (asyncio.Lock is FIFO).
+    Updates without a chat (e.g. inline queries) are not ordered.
+    """
+
+    def __init__(self, max_concurrent_updates: int = BOT_CONCURRENT_UPDATES):
+        super().__init__(max_concurrent_updates)
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._waiting: Dict[int, int] = {}
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        chat = update.effective_chat if isinstance(update, Update) else None
+        updates_in_progress.inc()
+        started = time.perf_counter()
+        try:
+            if chat is None:
+                await coroutine
+                return
+            lock = self._locks.get(chat.id)
+            if lock is None:
+                lock = self._locks[chat.id] = asyncio.Lock()
+            self._waiting[chat.id] = self._waiting.get(chat.id, 0) + 1
+            try:
+                async with lock:
+                    await coroutine
+            finally:
+                # Last update of the chat: drop its lock
+                self._waiting[chat.id] -= 1
+                if not self._waiting[chat.id]:
+                    del self._waiting[chat.id]
+                    del self._locks[chat.id]
+        finally:
+            updates_in_progress.dec()
+            update_seconds.observe(time.perf_counter() - started)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass